@@ -5,14 +5,18 @@ app.py - Streamlit Dashboard - Premium Edition
 
 import streamlit as st
 import pandas as pd
-from datetime import datetime
-import os
+from datetime import datetime, timedelta
+import time
 from dotenv import load_dotenv
 
 # استيراد الوحدات المساعدة
 from utils.auth import check_authentication, login_page, logout
-from utils.database import Database
-from utils.user_management import UserManager
+from utils.changes import CHANGE_KINDS
+from utils.database import PRICE_HISTORY_DAYS, Database
+from utils.export import EXPORT_FORMATS
+from utils.export_jobs import get_export_manager
+from utils.perf import perf
+from utils.user_management import AVATAR_SIZES, UserManager
 
 # تحميل المتغيرات البيئية
 load_dotenv()
@@ -25,9 +29,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# أحجام صفحات جدول المنتجات
+PAGE_SIZES = [25, 50, 100, 200]
+
 # تهيئة الكائنات
 db = Database()
 user_mgr = UserManager()
+export_mgr = get_export_manager()
 
 # CSS مخصص
 def load_custom_css():
@@ -229,12 +237,12 @@ def load_custom_css():
     </style>
     """, unsafe_allow_html=True)
 # دالة عرض صورة البروفايل
-def display_avatar(username):
+def display_avatar(username, size='sidebar'):
     """عرض صورة البروفايل"""
-    avatar_path = user_mgr.get_avatar_path(username)
+    avatar = user_mgr.get_avatar_bytes(username, size)
 
-    if avatar_path and os.path.exists(avatar_path):
-        st.image(avatar_path, width=120, use_container_width=False)
+    if avatar:
+        st.image(avatar, width=AVATAR_SIZES[size], use_container_width=False)
     else:
         # صورة افتراضية
         st.markdown(f"""
@@ -247,6 +255,211 @@ def display_avatar(username):
         </div>
         """, unsafe_allow_html=True)
 
+# منحنى صغير لاتجاه السعر
+def price_sparkline(prices, width=90, height=28):
+    """منحنى SVG لأسعار المنتج اليومية (أحمر عند الارتفاع، أخضر عند الانخفاض)"""
+    values = [p for p in prices if pd.notna(p)] if isinstance(prices, list) else []
+    if len(values) < 2:
+        return '<span style="color: #999;">—</span>'
+
+    low, high = min(values), max(values)
+    span = (high - low) or 1
+    step = width / (len(values) - 1)
+    points = ' '.join(
+        f"{i * step:.1f},{height - 2 - (value - low) / span * (height - 4):.1f}"
+        for i, value in enumerate(values)
+    )
+
+    if values[-1] > values[0]:
+        color = '#ef4444'
+    elif values[-1] < values[0]:
+        color = '#10b981'
+    else:
+        color = '#6366f1'
+
+    return (
+        f'<svg width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+        f'<title>{low:.2f} - {high:.2f} ر.س</title>'
+        f'<polyline fill="none" stroke="{color}" stroke-width="2" points="{points}"/></svg>'
+    )
+
+# جدول المنتجات (HTML للصفحة المعروضة فقط)
+def render_products_table(page_df, price_history=None):
+    """عرض صفحة واحدة من جدول المنتجات"""
+
+    # تنسيق العرض مع الروابط
+    display_df = page_df[['name', 'current_price', 'category', 'status', 'last_updated', 'url']].copy()
+
+    # منحنى السعر من سجل الأسعار (محمل لكل الصفحة باستعلام واحد)
+    if price_history is not None and not price_history.empty:
+        trends = price_history.groupby('product_id')['last_price'].agg(list)
+        display_df.insert(2, 'trend', page_df['product_id'].astype(str).map(trends).map(price_sparkline))
+    else:
+        display_df.insert(2, 'trend', price_sparkline([]))
+
+    # تحويل الاسم إلى رابط HTML
+    display_df['name'] = display_df.apply(
+        lambda row: f'<a href="{row["url"]}" target="_blank" style="color: #667eea; text-decoration: none; font-weight: 600; display: block; padding: 5px 0;">{row["name"][:80]}{"..." if len(row["name"]) > 80 else ""}</a>',
+        axis=1
+    )
+
+    # تنسيق السعر
+    display_df['current_price'] = display_df['current_price'].apply(
+        lambda x: f'<span style="color: #10b981; font-weight: 700; font-size: 1.1em;">{x:.2f} ر.س</span>' if pd.notna(x) else '<span style="color: #999;">غير متاح</span>'
+    )
+
+    # تنسيق الحالة
+    status_colors = {
+        'متوفر': '#10b981',
+        'نافد': '#f59e0b',
+        'مخفي': '#6366f1',
+        'محذوف': '#ef4444'
+    }
+
+    display_df['status'] = display_df['status'].apply(
+        lambda x: f'<span style="background: {status_colors.get(x, "#999")}; color: white; padding: 4px 12px; border-radius: 15px; font-size: 0.85em; font-weight: 600; white-space: nowrap;">{x}</span>'
+    )
+
+    # تنسيق التاريخ
+    display_df['last_updated'] = pd.to_datetime(display_df['last_updated']).dt.strftime('%Y-%m-%d<br>%H:%M')
+
+    # إزالة عمود URL
+    display_df = display_df.drop('url', axis=1)
+
+    # تسميات الأعمدة
+    display_df.columns = ['اسم المنتج', 'السعر', f'السعر ({PRICE_HISTORY_DAYS} يوم)', 'القسم', 'الحالة', 'آخر فحص']
+
+    # عرض الجدول
+    with perf.timed('dashboard.to_html', rows=len(display_df)) as span:
+        table_html = display_df.to_html(escape=False, index=False)
+        span.bytes = len(table_html.encode())
+    st.markdown(table_html, unsafe_allow_html=True)
+
+    # CSS للجدول
+    st.markdown("""
+    <style>
+    table {
+        width: 100%;
+        border-collapse: collapse;
+        background: white;
+        border-radius: 15px;
+        overflow: hidden;
+        box-shadow: 0 10px 30px rgba(0,0,0,0.15);
+        margin: 20px 0;
+    }
+
+    th {
+        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+        color: white !important;
+        padding: 18px 15px;
+        text-align: center;
+        font-weight: 700;
+        font-size: 1.05em;
+        position: sticky;
+        top: 0;
+        z-index: 10;
+    }
+
+    td {
+        padding: 15px;
+        border-bottom: 1px solid #f0f0f0;
+        text-align: center;
+        vertical-align: middle;
+    }
+
+    tr:hover {
+        background: #f8f9fb;
+        transition: all 0.2s ease;
+    }
+
+    tr:last-child td {
+        border-bottom: none;
+    }
+
+    a:hover {
+        color: #764ba2 !important;
+        text-decoration: underline !important;
+    }
+
+    /* تحسين responsive */
+    @media (max-width: 1400px) {
+        th, td {
+            padding: 12px 8px;
+            font-size: 0.95em;
+        }
+    }
+    </style>
+    """, unsafe_allow_html=True)
+
+# حالة مهمة التصدير الحالية
+def export_job_status():
+    """عرض تقدم مهمة التصدير وزر التحميل عند انتهائها"""
+    job_id = st.session_state.get('export_job_id')
+    job = export_mgr.get(job_id) if job_id else None
+
+    if job is None:
+        return
+
+    if not job.finished:
+        export_job_progress()
+    elif job.status == 'failed':
+        st.error(f"❌ خطأ في التصدير: {job.error}")
+    else:
+        writer = EXPORT_FORMATS[job.fmt]
+        try:
+            with open(job.path, 'rb') as f:
+                st.download_button(
+                    label="✅ اضغط هنا للتحميل",
+                    data=f,
+                    file_name=f"janoubco_inventory_{datetime.now().strftime('%Y%m%d')}.{writer.extension}",
+                    mime=writer.mime,
+                    use_container_width=True
+                )
+        except FileNotFoundError:
+            st.warning("⚠️ انتهت صلاحية الملف، يرجى تجهيزه مرة أخرى")
+
+# تقدم المهمة الجارية (يتحدث وحده كل ثانية دون إعادة تشغيل الصفحة كاملة)
+@st.fragment(run_every=1)
+def export_job_progress():
+    """شريط التقدم؛ عند انتهاء المهمة تُعاد الصفحة لعرض النتيجة بدل هذا الجزء"""
+    job_id = st.session_state.get('export_job_id')
+    job = export_mgr.get(job_id) if job_id else None
+
+    if job is None or job.finished:
+        st.rerun()
+
+    progress = min(job.done / job.total, 1.0) if job.total else 0.0
+    st.progress(progress, text=f"⏳ تم تجهيز {job.done} من {job.total or '...'} منتج")
+
+# موجز التغييرات خلال آخر ساعات
+def changes_panel():
+    """عرض المنتجات الجديدة وتغيرات الأسعار والحالة خلال الفترة المختارة"""
+    with st.expander("🆕 ما الذي تغير؟"):
+        periods = {"آخر ساعة": 1, "آخر 6 ساعات": 6, "آخر 24 ساعة": 24, "آخر 3 أيام": 72}
+        period = st.selectbox("الفترة", list(periods.keys()), index=2, key='changes_period')
+
+        # التقريب للدقيقة حتى يستفيد الاستعلام من الكاش بين إعادات التشغيل
+        since = (datetime.now().astimezone() - timedelta(hours=periods[period])).replace(second=0, microsecond=0)
+        changes = db.get_changes(since)
+
+        counts = changes['kind'].value_counts()
+        columns = st.columns(len(CHANGE_KINDS))
+        for column, (kind, label) in zip(columns, CHANGE_KINDS.items()):
+            column.metric(label, int(counts.get(kind, 0)))
+
+        if changes.empty:
+            st.info("لا توجد تغييرات خلال هذه الفترة")
+            return
+
+        display_df = changes.head(200).copy()
+        display_df['kind'] = display_df['kind'].map(CHANGE_KINDS)
+        display_df = display_df[['changed_at', 'kind', 'name', 'old_price', 'new_price']]
+        display_df.columns = ['الوقت', 'التغيير', 'اسم المنتج', 'السعر السابق', 'السعر الحالي']
+
+        st.dataframe(display_df, use_container_width=True, hide_index=True)
+        if len(changes) > len(display_df):
+            st.caption(f"عرض أحدث {len(display_df)} من {len(changes)} تغيير")
+
 # صفحة لوحة التحكم الرئيسية
 def main_dashboard():
     """لوحة التحكم الرئيسية"""
@@ -256,7 +469,6 @@ def main_dashboard():
 
     # جلب البيانات
     with st.spinner("🔄 جاري تحميل البيانات..."):
-        products_df = db.get_products()
         stats = db.get_statistics()
 
     # عرض الإحصائيات
@@ -314,6 +526,9 @@ def main_dashboard():
 
     st.markdown("<br>", unsafe_allow_html=True)
 
+    # موجز التغييرات
+    changes_panel()
+
     # الفلاتر
     st.subheader("🔍 البحث والفلترة")
 
@@ -332,142 +547,103 @@ def main_dashboard():
     with col3:
         search_query = st.text_input("🔎 البحث بالاسم", placeholder="ابحث عن منتج...")
 
-    # تطبيق الفلاتر
-    filtered_df = products_df.copy()
-
-    if status_filter != "الكل":
-        filtered_df = filtered_df[filtered_df['status'] == status_filter]
-
-    if category_filter != "الكل":
-        filtered_df = filtered_df[filtered_df['category'] == category_filter]
-
-    if search_query:
-        filtered_df = filtered_df[filtered_df['name'].str.contains(search_query, case=False, na=False)]
-
-        # عرض النتائج
-        # عرض النتائج
-        # عرض النتائج
-    # عرض النتائج
-    st.subheader(f"📋 المنتجات ({len(filtered_df)} منتج)")
-
-    if not filtered_df.empty:
-        # خيارات الترتيب
-        col1, col2 = st.columns([3, 1])
-
-        with col1:
-            sort_by = st.selectbox(
-                "ترتيب حسب",
-                ["آخر فحص (الأحدث)", "السعر (الأعلى)", "السعر (الأقل)", "الاسم (أ-ي)", "الاسم (ي-أ)"]
-            )
-
-        # تطبيق الترتيب
-        if sort_by == "آخر فحص (الأحدث)":
-            filtered_df = filtered_df.sort_values('last_checked', ascending=False, na_position='last')
-        elif sort_by == "السعر (الأعلى)":
-            filtered_df = filtered_df.sort_values('current_price', ascending=False, na_position='last')
-        elif sort_by == "السعر (الأقل)":
-            filtered_df = filtered_df.sort_values('current_price', ascending=True, na_position='last')
-        elif sort_by == "الاسم (أ-ي)":
-            filtered_df = filtered_df.sort_values('name', ascending=True)
-        elif sort_by == "الاسم (ي-أ)":
-            filtered_df = filtered_df.sort_values('name', ascending=False)
-
-        # تنسيق العرض مع الروابط
-        display_df = filtered_df[['name', 'current_price', 'category', 'status', 'last_checked', 'url']].copy()
-
-        # تحويل الاسم إلى رابط HTML
-        display_df['name'] = display_df.apply(
-            lambda row: f'<a href="{row["url"]}" target="_blank" style="color: #667eea; text-decoration: none; font-weight: 600; display: block; padding: 5px 0;">{row["name"][:80]}{"..." if len(row["name"]) > 80 else ""}</a>',
-            axis=1
-        )
-
-        # تنسيق السعر
-        display_df['current_price'] = display_df['current_price'].apply(
-            lambda x: f'<span style="color: #10b981; font-weight: 700; font-size: 1.1em;">{x:.2f} ر.س</span>' if pd.notna(x) else '<span style="color: #999;">غير متاح</span>'
-        )
+    # تطبيق الفلاتر في قاعدة البيانات
+    filters = {
+        'status': None if status_filter == "الكل" else status_filter,
+        'category': None if category_filter == "الكل" else category_filter,
+        'search': search_query or None
+    }
 
-        # تنسيق الحالة
-        status_colors = {
-            'متوفر': '#10b981',
-            'نافد': '#f59e0b',
-            'مخفي': '#6366f1',
-            'محذوف': '#ef4444'
-        }
+    # البحث بالاسم (يدعم اختلاف الهمزات والتاء المربوطة والتشكيل): فهرس داخل الذاكرة للكتالوج
+    # الصغير، أو فهارس PostgreSQL عندما يكون الكتالوج أكبر من أن يُحمّل في كل عملية
+    use_search_index = bool(search_query) and db.search_strategy(stats['total']) == 'memory'
 
-        display_df['status'] = display_df['status'].apply(
-            lambda x: f'<span style="background: {status_colors.get(x, "#999")}; color: white; padding: 4px 12px; border-radius: 15px; font-size: 0.85em; font-weight: 600; white-space: nowrap;">{x}</span>'
+    if use_search_index:
+        products_frame, positions = db.search_products(
+            search_query, filters['status'], filters['category']
         )
+        total_count = len(positions)
+    else:
+        total_count = db.count_products(**filters)
 
-        # تنسيق التاريخ
-        display_df['last_checked'] = pd.to_datetime(display_df['last_checked']).dt.strftime('%Y-%m-%d<br>%H:%M')
-
-        # إزالة عمود URL
-        display_df = display_df.drop('url', axis=1)
-
-        # تسميات الأعمدة
-        display_df.columns = ['اسم المنتج', 'السعر', 'القسم', 'الحالة', 'آخر فحص']
-
-        # عرض الجدول
-        st.markdown(
-            display_df.to_html(escape=False, index=False),
-            unsafe_allow_html=True
-        )
+    sort_key = 'last_checked'
+    export_filters = filters
 
-        # CSS للجدول
-        st.markdown("""
-        <style>
-        table {
-            width: 100%;
-            border-collapse: collapse;
-            background: white;
-            border-radius: 15px;
-            overflow: hidden;
-            box-shadow: 0 10px 30px rgba(0,0,0,0.15);
-            margin: 20px 0;
+    # عرض النتائج
+    st.subheader(f"📋 المنتجات ({total_count} منتج)")
+
+    if total_count:
+        # خيارات الترتيب والصفحات
+        col1, col2, col3 = st.columns([3, 1, 1])
+
+        sort_options = {
+            "آخر فحص (الأحدث)": 'last_checked',
+            "السعر (الأعلى)": 'price_desc',
+            "السعر (الأقل)": 'price_asc',
+            "الاسم (أ-ي)": 'name_asc',
+            "الاسم (ي-أ)": 'name_desc'
         }
 
-        th {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white !important;
-            padding: 18px 15px;
-            text-align: center;
-            font-weight: 700;
-            font-size: 1.05em;
-            position: sticky;
-            top: 0;
-            z-index: 10;
-        }
+        if search_query:
+            sort_options = {"الأكثر تطابقاً": 'relevance', **sort_options}
 
-        td {
-            padding: 15px;
-            border-bottom: 1px solid #f0f0f0;
-            text-align: center;
-            vertical-align: middle;
-        }
+        with col1:
+            sort_by = st.selectbox("ترتيب حسب", list(sort_options.keys()))
 
-        tr:hover {
-            background: #f8f9fb;
-            transition: all 0.2s ease;
-        }
+        sort_key = sort_options[sort_by]
 
-        tr:last-child td {
-            border-bottom: none;
-        }
+        with col2:
+            page_size = st.selectbox("عدد الصفوف", PAGE_SIZES, index=1)
+
+        # إعادة الصفحة للأولى عند تغيير الفلاتر أو الترتيب
+        total_pages = max(1, -(-total_count // page_size))
+        page_signature = (tuple(filters.items()), sort_by, page_size)
+        if st.session_state.get('products_page_signature') != page_signature:
+            st.session_state['products_page_signature'] = page_signature
+            st.session_state['products_page'] = 1
+        elif st.session_state.get('products_page', 1) > total_pages:
+            st.session_state['products_page'] = total_pages
+
+        with col3:
+            page = st.number_input(
+                f"الصفحة (من {total_pages})",
+                min_value=1,
+                max_value=total_pages,
+                step=1,
+                key='products_page'
+            )
 
-        a:hover {
-            color: #764ba2 !important;
-            text-decoration: underline !important;
-        }
+        # جلب صفوف الصفحة الحالية فقط
+        offset = (page - 1) * page_size
 
-        /* تحسين responsive */
-        @media (max-width: 1400px) {
-            th, td {
-                padding: 12px 8px;
-                font-size: 0.95em;
-            }
-        }
-        </style>
-        """, unsafe_allow_html=True)
+        # فلترة وترتيب وقراءة الصفحة
+        with perf.timed('dashboard.page') as span:
+            if use_search_index:
+                if sort_key != 'relevance':
+                    products_frame, positions = db.search_products(
+                        search_query, filters['status'], filters['category'], sort_key
+                    )
+                page_df = products_frame.iloc[positions[offset:offset + page_size]]
+
+                # التصدير يأخذ نفس نتائج البحث بالمعرفات
+                export_filters = {
+                    'status': filters['status'],
+                    'category': filters['category'],
+                    'ids': products_frame['id'].to_numpy()[positions].tolist()
+                }
+                if sort_key == 'relevance':
+                    sort_key = 'last_checked'
+            else:
+                page_df = db.query_products(**filters, sort=sort_key, limit=page_size, offset=offset)
+            span.rows = len(page_df)
+
+        # العدد من كاش مستقل؛ الصفحة قد تكون فارغة (خطأ في قاعدة البيانات أو تغيرت البيانات بينهما)
+        if page_df.empty:
+            st.info("لا توجد منتجات في هذه الصفحة")
+        else:
+            price_history = db.get_price_history(page_df['product_id'].tolist())
+            render_products_table(page_df, price_history)
+            st.caption(f"عرض {offset + 1} - {offset + len(page_df)} من {total_count} منتج")
 
         # إضافة قسم تصدير البيانات (أسفل الجدول)
     user_role = st.session_state.get('user_data', {}).get('role')
@@ -479,19 +655,22 @@ def main_dashboard():
 
         col1, col2 = st.columns([1, 3])
         with col1:
-            if st.button("📊 تجهيز ملف Excel", use_container_width=True):
-                with st.spinner("⏳ جاري إنشاء الملف..."):
-                    excel_data = db.export_to_excel(filtered_df)
-                    if excel_data:
-                        st.download_button(
-                            label="✅ اضغط هنا للتحميل",
-                            data=excel_data,
-                            file_name=f"janoubco_inventory_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                            use_container_width=True
-                        )
+            export_format = st.selectbox(
+                "صيغة الملف",
+                list(EXPORT_FORMATS.keys()),
+                format_func=lambda x: {"xlsx": "Excel", "csv": "CSV", "parquet": "Parquet"}[x]
+            )
+
+            if st.button("📊 تجهيز الملف", use_container_width=True):
+                try:
+                    job = export_mgr.submit(db, export_format, export_filters, sort_key)
+                    st.session_state['export_job_id'] = job.id
+                except Exception as e:
+                    st.error(f"❌ خطأ في التصدير: {str(e)}")
+
+            export_job_status()
         with col2:
-            st.info("💡 يمكنك تحميل النتائج المفلترة حالياً كملف Excel متوافق مع كافة الأنظمة.")
+            st.info("💡 يمكنك تحميل النتائج المفلترة حالياً كملف Excel أو CSV أو Parquet.")
 # صفحة إدارة المستخدمين
 def users_management_page():
     """صفحة إدارة المستخدمين (Super Admin فقط)"""
@@ -676,7 +855,7 @@ def profile_page():
         st.markdown("### 📸 صورة الملف الشخصي")
 
         # عرض الصورة الحالية
-        display_avatar(username)
+        display_avatar(username, size='profile')
 
         # رفع صورة جديدة
         uploaded_file = st.file_uploader(
@@ -774,6 +953,81 @@ def profile_page():
                     else:
                         st.error(f"❌ {message}")
 
+# صفحة الأداء
+def performance_page():
+    """قياسات زمن المسارات الساخنة في هذه العملية (Super Admin فقط)"""
+
+    user_role = st.session_state.get('user_data', {}).get('role')
+    if user_role != 'super_admin':
+        st.error("❌ ليس لديك صلاحية للوصول لهذه الصفحة")
+        return
+
+    st.title("⏱️ الأداء")
+
+    stats = perf.snapshot()
+    uptime = time.time() - perf.started_at
+    st.caption(f"قياسات هذه العملية منذ {uptime / 60:.0f} دقيقة")
+
+    if not stats:
+        st.info("لا توجد قياسات بعد")
+    else:
+        rows = [{
+            'المرحلة': stage,
+            'عدد المرات': s['count'],
+            'المتوسط (ms)': round(s['mean_seconds'] * 1000, 1),
+            'p50 (ms)': round(s['p50_seconds'] * 1000, 1),
+            'p95 (ms)': round(s['p95_seconds'] * 1000, 1),
+            'الأقصى (ms)': round(s['max_seconds'] * 1000, 1),
+            'الإجمالي (s)': round(s['total_seconds'], 2),
+            'الصفوف': s['rows'],
+            'البيانات (MB)': round(s['bytes'] / 1024 / 1024, 2),
+            'أخطاء': s['errors'],
+        } for stage, s in stats.items()]
+
+        st.dataframe(
+            pd.DataFrame(rows).sort_values('الإجمالي (s)', ascending=False),
+            use_container_width=True,
+            hide_index=True
+        )
+        st.caption("p50 و p95 تقديرات من حدود الهيستوغرام")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button(
+            "📄 تحميل JSON",
+            data=perf.to_json(),
+            file_name=f"perf_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            mime="application/json",
+            use_container_width=True
+        )
+    with col2:
+        st.download_button(
+            "📈 تحميل Prometheus",
+            data=perf.to_prometheus(),
+            file_name="perf.prom",
+            mime="text/plain",
+            use_container_width=True
+        )
+    with col3:
+        if st.button("🔄 تصفير القياسات", use_container_width=True):
+            perf.reset()
+            st.rerun()
+
+    # ذاكرة نسخة المنتجات في هذه العملية
+    st.divider()
+    st.subheader("🧠 ذاكرة جدول المنتجات")
+
+    report = db.products_memory_report()
+    if report is None:
+        st.info("نسخة المنتجات لم تُحمّل في هذه العملية بعد (تُحمّل عند أول بحث)")
+        return
+
+    st.metric("الإجمالي", f"{report['bytes'].sum() / 1024 / 1024:.1f} MB")
+    report = report.assign(MB=(report['bytes'] / 1024 / 1024).round(2)).drop(columns='bytes')
+    report.columns = ['العمود', 'النوع', 'MB']
+    st.dataframe(report, use_container_width=True, hide_index=True)
+    st.caption("memory_usage(deep=True)؛ الأعمدة النصية من النسخة المشتركة (Arrow) مقروءة من ملف مربوط بالذاكرة")
+
 # الدالة الرئيسية
 def main():
     """الدالة الرئيسية للتطبيق"""
@@ -814,7 +1068,7 @@ def main():
         page = st.radio(
             "اختر الصفحة",
             ["📊 لوحة التحكم", "👤 الملف الشخصي"] +
-            (["👥 إدارة المستخدمين"] if user_data.get('role') == 'super_admin' else []),
+            (["👥 إدارة المستخدمين", "⏱️ الأداء"] if user_data.get('role') == 'super_admin' else []),
             label_visibility="collapsed"
         )
 
@@ -835,6 +1089,11 @@ def main():
         profile_page()
     elif page == "👥 إدارة المستخدمين":
         users_management_page()
+    elif page == "⏱️ الأداء":
+        performance_page()
+
+    # تصدير القياسات إلى ملف إذا كان PERF_EXPORT_PATH مضبوطاً
+    perf.maybe_export()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,93 @@
+"""
+benchmarks/bench_copy_loader.py - Products Loader Benchmark
+مقارنة تحميل جدول المنتجات عبر pd.read_sql والتحميل عبر COPY ... TO STDOUT على PostgreSQL
+
+BENCH_DATABASE_URL=postgresql://... python benchmarks/bench_copy_loader.py [100000 500000]
+"""
+
+import gc
+import logging
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import load_postgres, make_products  # noqa: E402
+from utils.database import PRODUCT_COLUMNS  # noqa: E402
+
+for _name in list(logging.root.manager.loggerDict):
+    if _name.startswith('streamlit'):
+        logging.getLogger(_name).setLevel(logging.ERROR)
+
+# تحذير pandas عن اتصال DBAPI2 غير SQLAlchemy جزء من المسار القديم نفسه
+warnings.filterwarnings('ignore', message='.*SQLAlchemy.*')
+
+SIZES = [100_000, 500_000]
+REPEATS = 3
+
+QUERY = f"SELECT {PRODUCT_COLUMNS} FROM products ORDER BY last_updated DESC NULLS LAST"
+
+
+def best_of(func):
+    """أفضل زمن من REPEATS مرات + ذروة الذاكرة في تشغيل إضافي"""
+    timings = []
+    for _ in range(REPEATS):
+        gc.collect()
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return min(timings), peak / 1024 / 1024, result
+
+
+def assert_same(expected, actual):
+    """نفس القيم بعد توحيد الأنواع (read_sql يعيد object للأعمدة التي فيها NULL)"""
+    assert list(expected.columns) == list(actual.columns)
+    for column in expected.columns:
+        left, right = expected[column], actual[column]
+        if pd.api.types.is_datetime64_any_dtype(right):
+            left = pd.to_datetime(left, utc=True)
+            right = right.dt.tz_localize('UTC') if right.dt.tz is None else right
+            assert left.equals(right), column
+        elif pd.api.types.is_numeric_dtype(right) or pd.api.types.is_bool_dtype(right):
+            assert (left.astype('float64').fillna(-1) == right.astype('float64').fillna(-1)).all(), column
+        else:
+            assert (left.fillna('').astype(str) == right.fillna('').astype(str)).all(), column
+
+
+def main(sizes):
+    dsn = os.getenv('BENCH_DATABASE_URL')
+    if not dsn:
+        sys.exit("❌ BENCH_DATABASE_URL مطلوب (COPY متاح في PostgreSQL فقط)")
+
+    print(f"{'rows':>10} {'read_sql (s)':>13} {'MB':>7} {'copy (s)':>10} {'MB':>7} {'speedup':>9}")
+
+    for rows in sizes:
+        db = load_postgres(make_products(rows), dsn)
+
+        legacy_time, legacy_mb, legacy = best_of(lambda: db.read_sql(QUERY))
+        copy_time, copy_mb, copied = best_of(lambda: db.copy_sql(QUERY))
+
+        # التأكد من تطابق النتائج قبل المقارنة
+        assert len(legacy) == len(copied) == rows
+        assert_same(legacy, copied)
+
+        print(f"{rows:>10,} {legacy_time:>13.3f} {legacy_mb:>7.1f} {copy_time:>10.3f} {copy_mb:>7.1f}"
+              f" {legacy_time / copy_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,101 @@
+"""
+benchmarks/bench_derived_columns.py - Derived Columns Micro-benchmark
+مقارنة اشتقاق عمودي status و price بالطريقة القديمة (apply) والطريقة المتجهة
+
+python benchmarks/bench_derived_columns.py [10000 100000 1000000]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import derive_status  # noqa: E402
+
+SIZES = [10_000, 100_000, 1_000_000]
+REPEATS = 3
+
+
+def make_frame(rows, seed=42):
+    """جدول اصطناعي بنفس أعمدة الحالة والسعر"""
+    rng = np.random.default_rng(seed)
+    prices = rng.uniform(1, 5000, rows).round(2)
+    prices[rng.random(rows) < 0.05] = np.nan
+
+    return pd.DataFrame({
+        'is_deleted': rng.random(rows) < 0.05,
+        'is_out_of_stock': rng.random(rows) < 0.15,
+        'is_hidden': rng.random(rows) < 0.05,
+        'current_price': prices
+    })
+
+
+def format_prices(prices, currency='ريال', missing='غير متاح'):
+    """تنسيق الأسعار كنص "0.00 ريال" بعمليات numpy على المصفوفة كاملة"""
+    values = pd.to_numeric(prices, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    is_missing = np.isnan(values)
+
+    cents = np.rint(np.where(is_missing, 0, values) * 100).astype(np.int64)
+    sign = np.where(cents < 0, '-', '')
+    cents = np.abs(cents)
+
+    text = np.char.add(sign, (cents // 100).astype(str))
+    text = np.char.add(text, '.')
+    text = np.char.add(text, np.char.zfill((cents % 100).astype(str), 2))
+    text = np.char.add(text, f' {currency}')
+
+    return pd.Series(np.where(is_missing, missing, text), index=prices.index)
+
+
+def legacy(df):
+    """التنفيذ السابق: apply على كل صف"""
+    def get_status(row):
+        if row['is_deleted']:
+            return 'محذوف'
+        elif row['is_out_of_stock']:
+            return 'نافد'
+        elif row['is_hidden']:
+            return 'مخفي'
+        else:
+            return 'متوفر'
+
+    status = df.apply(get_status, axis=1)
+    price = df['current_price'].apply(lambda x: f"{x:.2f} ريال" if pd.notna(x) else "غير متاح")
+    return status, price
+
+
+def vectorized(df):
+    """derive_status من utils/database.py مع تنسيق الأسعار المتجه أعلاه"""
+    return derive_status(df), format_prices(df['current_price'])
+
+
+def best_of(func, df):
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'apply (s)':>12} {'vectorized (s)':>15} {'speedup':>9}")
+
+    for rows in sizes:
+        df = make_frame(rows)
+        legacy_time, (legacy_status, legacy_price) = best_of(legacy, df)
+        fast_time, (fast_status, fast_price) = best_of(vectorized, df)
+
+        # التأكد من تطابق النتائج قبل المقارنة
+        assert (np.asarray(fast_status, dtype=object) == legacy_status.to_numpy()).all()
+        assert (fast_price.to_numpy() == legacy_price.to_numpy()).all()
+
+        print(f"{rows:>10,} {legacy_time:>12.3f} {fast_time:>15.3f} {legacy_time / fast_time:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,109 @@
+"""
+benchmarks/check_bulk_reads.py - Bulk Read Regression Checks
+حالات حدّية في مسارات القراءة الكبيرة لا تظهر في البيانات الاصطناعية العادية (لا تحتاج قاعدة بيانات)
+
+python benchmarks/check_bulk_reads.py
+"""
+
+import io
+import logging
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import add_derived_columns  # noqa: E402
+from utils.pg_copy import frame_from_rows, parse_copy_csv  # noqa: E402
+from utils.snapshot import ProductSnapshot  # noqa: E402
+
+for _name in list(logging.root.manager.loggerDict):
+    if _name.startswith('streamlit'):
+        logging.getLogger(_name).setLevel(logging.ERROR)
+
+# أعمدة الاستعلام كما يصفها cursor.description: (الاسم، OID النوع)
+COLUMNS = [
+    ('id', 20), ('name', 25), ('category', 25), ('current_price', 1700),
+    ('is_deleted', 16), ('is_out_of_stock', 16), ('is_hidden', 16), ('last_updated', 1184),
+]
+
+
+def stream_batch(categories, start=0):
+    """دفعة كما يعطيها stream_sql ثم iter_product_batches"""
+    rows = [
+        (start + i, f"منتج {start + i}", category, '19.99', False, False, False, '2024-12-31 10:00:00+00')
+        for i, category in enumerate(categories)
+    ]
+    return add_derived_columns(frame_from_rows(rows, COLUMNS))
+
+
+def check_snapshot_batches(first, second):
+    """الدفعة الثانية يجب أن تُكتب بـ schema الدفعة الأولى مهما كانت قيمها"""
+    batches = [stream_batch(first), stream_batch(second, start=len(first))]
+
+    with tempfile.TemporaryDirectory(prefix='janoubco_check_') as directory:
+        snapshot = ProductSnapshot(directory, 'products-check')
+        name, rows = snapshot.write_file(batches)
+        frame = snapshot.map_file(name)
+
+        assert rows == len(first) + len(second)
+        categories = frame['category'].astype(object)
+        assert categories.where(categories.notna(), None).tolist() == first + second
+        assert (frame['status'] == 'متوفر').all()
+
+
+def check_multiline_copy_csv(rows=50_000):
+    """COPY CSV يضع القيم متعددة الأسطر بين علامتي تنصيص؛ بعضها يقع على حدود كتل قارئ CSV (1MB)"""
+    buffer = io.BytesIO()
+    buffer.write(b'id,name,url\n')
+    for i in range(rows):
+        buffer.write(f'{i},"منتج {i}\nسطر ثانٍ ""مقتبس""",https://example.com/p/{i}\n'.encode())
+    buffer.seek(0)
+
+    frame = parse_copy_csv(buffer, [('id', 20), ('name', 25), ('url', 25)])
+
+    assert len(frame) == rows
+    assert frame['name'].iloc[-1] == f'منتج {rows - 1}\nسطر ثانٍ "مقتبس"'
+    assert frame['url'].iloc[-1] == f'https://example.com/p/{rows - 1}'
+
+
+def check_empty_text_vs_null():
+    """COPY بعلامة NULL الصريحة: النص الفارغ '' يبقى نصاً (واجهة الجدول تقطع الاسم كنص)"""
+    buffer = io.BytesIO(b'id,name,url,current_price\n1,,\\N,\\N\n2,"\\N",,10.5\n')
+
+    frame = parse_copy_csv(buffer, [('id', 20), ('name', 25), ('url', 25), ('current_price', 1700)])
+
+    assert frame['name'].tolist() == ['', '\\N']
+    assert frame['url'].isna().tolist() == [True, False] and frame['url'].iloc[1] == ''
+    assert frame['current_price'].isna().tolist() == [True, False]
+
+
+CHECKS = {
+    # القاموس في الدفعة الأولى صغير (int8) والدفعة الثانية فيها أكثر من 127 قسماً
+    'snapshot: >127 categories after a small first batch': lambda: check_snapshot_batches(
+        ['أ', 'ب'], [f"قسم {i}" for i in range(200)]
+    ),
+    # كل الأقسام NULL في الدفعة الأولى (قاموس من نوع null)
+    'snapshot: all-NULL categories in the first batch': lambda: check_snapshot_batches(
+        [None, None, None], ['أ', 'ب', None]
+    ),
+    'copy csv: quoted multi-line values across reader blocks': check_multiline_copy_csv,
+    'copy csv: empty text stays distinct from NULL': check_empty_text_vs_null,
+}
+
+
+def main():
+    failed = 0
+    for label, check in CHECKS.items():
+        try:
+            check()
+            print(f"✅ {label}")
+        except Exception as e:
+            failed += 1
+            print(f"❌ {label}: {type(e).__name__}: {e}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+benchmarks/run_benchmarks.py - Benchmark Suite
+قياس زمن وذروة ذاكرة المسارات الرئيسية على بيانات اصطناعية، ومقارنتها بخط أساس محفوظ
+
+python benchmarks/run_benchmarks.py                        # 1k / 10k / 100k على SQLite بديل
+python benchmarks/run_benchmarks.py --sizes 1000 1000000
+BENCH_DATABASE_URL=postgresql://... python benchmarks/run_benchmarks.py   # PostgreSQL محلي
+python benchmarks/run_benchmarks.py --save-baseline        # حفظ النتائج كخط أساس
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# القياس لمسار ملف المستخدمين وليس لتكلفة KDF
+os.environ.setdefault('SCRYPT_N', '1024')
+
+from benchmarks.synthetic import load_postgres, load_sqlite, make_products  # noqa: E402
+from utils.database import Database  # noqa: E402
+from utils.search import ProductSearchIndex  # noqa: E402
+
+# Streamlit يطبع تحذيراً عند كل استدعاء لدوال cache_data خارج التطبيق
+for _name in list(logging.root.manager.loggerDict):
+    if _name.startswith('streamlit'):
+        logging.getLogger(_name).setLevel(logging.ERROR)
+
+SIZES = [1_000, 10_000, 100_000]
+USER_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'results', 'baseline.json')
+
+# Excel بطيء بطبيعته؛ نقيسه على حد أعلى من الصفوف حتى لا يطغى على بقية المراحل
+EXPORT_MAX_ROWS = int(os.getenv('BENCH_EXPORT_MAX_ROWS', '100000'))
+
+# أعمدة جدول العرض في app.render_products_table
+DISPLAY_COLUMNS = ['name', 'current_price', 'category', 'status', 'last_updated', 'url']
+
+
+def measure(func, repeats):
+    """أفضل زمن من repeats مرات، ثم تشغيل إضافي تحت tracemalloc لذروة الذاكرة"""
+    timings = []
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'seconds': min(timings), 'peak_mb': peak / 1024 / 1024}
+
+
+def clear_caches():
+    """st.cache_data يحفظ النتائج بين الاستدعاءات؛ القياس يجب أن يصل إلى قاعدة البيانات"""
+    for method in (Database.get_statistics, Database.get_categories,
+                   Database.query_products, Database.count_products):
+        method.clear()
+
+
+def product_stages(db, rows):
+    """المراحل التي تعمل على جدول المنتجات"""
+    frame = db.fetch_products()
+    assert len(frame) == rows, f"expected {rows} rows, got {len(frame)}"
+    index = ProductSearchIndex(frame['name'].tolist())
+
+    def statistics():
+        clear_caches()
+        assert db.get_statistics()['total'] == rows
+
+    def categories():
+        clear_caches()
+        assert db.get_categories()
+
+    def dashboard_sql():
+        # فلترة + ترتيب + صفحة في قاعدة البيانات ثم HTML الصفحة
+        clear_caches()
+        page = db.query_products(status='متوفر', sort='price_desc', limit=50, offset=0)
+        page[DISPLAY_COLUMNS].to_html(escape=False, index=False)
+
+    def dashboard_search():
+        # البحث في الفهرس + ترتيب بالسعر + صفحة من المواقع ثم HTML الصفحة
+        positions = index.search('شاشه سامسونج')
+        positions = positions[frame['status'].to_numpy()[positions] == 'متوفر']
+        values = frame['current_price'].iloc[positions].reset_index(drop=True)
+        order = values.sort_values(ascending=False, na_position='last', kind='stable').index
+        page = frame.iloc[positions[order.to_numpy()][:50]]
+        page[DISPLAY_COLUMNS].to_html(escape=False, index=False)
+
+    export_frame = frame.head(EXPORT_MAX_ROWS)
+
+    return {
+        'get_products': lambda: db.fetch_products(),
+        'get_statistics': statistics,
+        'get_categories': categories,
+        'search_index_build': lambda: ProductSearchIndex(frame['name'].tolist()),
+        'dashboard_sql_page': dashboard_sql,
+        'dashboard_search_page': dashboard_search,
+        f'export_to_excel (<= {EXPORT_MAX_ROWS:,} rows)': lambda: db.export_to_excel(export_frame),
+    }
+
+
+def user_stages(users, workdir):
+    """تسجيل الدخول مع ملف مستخدمين كبير: أول مرة (قراءة الملف + KDF) ثم من الكاش"""
+    from utils.credentials import hash_password, verified_cache
+    from utils.user_backends import JSONUserBackend, UserStore
+    from utils.user_management import UserManager
+
+    users_file = os.path.join(workdir, f'users_{users}.json')
+    stored = hash_password('secret123')
+    with open(users_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            f'user{i}': {'password': stored, 'name': f'User {i}', 'role': 'viewer', 'email': '', 'avatar': None}
+            for i in range(users)
+        }, f, ensure_ascii=False)
+
+    target = f'user{users - 1}'
+
+    def cold():
+        # مخزن جديد في كل مرة حتى يشمل القياس قراءة الملف وحساب KDF
+        backend = JSONUserBackend(users_file)
+        backend.store = UserStore(users_file)
+        verified_cache.clear()
+        assert UserManager(users_file=users_file, backend=backend).authenticate(target, 'secret123')
+
+    warm_mgr = UserManager(users_file=users_file, backend=JSONUserBackend(users_file))
+    assert warm_mgr.authenticate(target, 'secret123')
+
+    return {
+        'authenticate_cold': cold,
+        'authenticate_warm': lambda: warm_mgr.authenticate(target, 'secret123'),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """المراحل التي أصبحت أبطأ من خط الأساس بأكثر من tolerance"""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        # تجاهل الفروق الصغيرة جداً (ضجيج القياس)
+        if result['seconds'] > base['seconds'] * (1 + tolerance) and result['seconds'] - base['seconds'] > 0.005:
+            regressions.append(key)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--user-sizes', type=int, nargs='+', default=USER_SIZES)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='نسبة التباطؤ المسموحة (0.25 = 25%%)')
+    parser.add_argument('--output', help='حفظ النتائج كـ JSON')
+    args = parser.parse_args()
+
+    dsn = os.getenv('BENCH_DATABASE_URL')
+    backend = 'postgres' if dsn else 'sqlite'
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved['meta']['backend'] == backend:
+            baseline = saved['results']
+        else:
+            print(f"⚠️ خط الأساس مقاس على {saved['meta']['backend']}، لن تتم المقارنة")
+
+    results = {}
+    print(f"backend: {backend}")
+    print(f"{'stage':<44} {'size':>10} {'seconds':>10} {'peak MB':>9} {'baseline':>10} {'change':>8}")
+
+    def report(stage, size, result):
+        key = f"{stage}@{size}"
+        results[key] = result
+        base = baseline.get(key)
+        change = f"{(result['seconds'] / base['seconds'] - 1) * 100:+.0f}%" if base and base['seconds'] else ''
+        base_text = f"{base['seconds']:.4f}" if base else ''
+        print(f"{stage:<44} {size:>10,} {result['seconds']:>10.4f} {result['peak_mb']:>9.1f} {base_text:>10} {change:>8}")
+
+    with tempfile.TemporaryDirectory(prefix='janoubco_bench_') as workdir:
+        for rows in args.sizes:
+            df = make_products(rows)
+            db = load_postgres(df, dsn) if dsn else load_sqlite(df, os.path.join(workdir, 'products.db'))
+            del df
+
+            for stage, func in product_stages(db, rows).items():
+                report(stage, rows, measure(func, args.repeats))
+
+        for users in args.user_sizes:
+            for stage, func in user_stages(users, workdir).items():
+                report(stage, users, measure(func, args.repeats))
+
+    meta = {
+        'backend': backend,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+    if args.output or args.save_baseline:
+        path = args.baseline if args.save_baseline else args.output
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'meta': meta, 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 {path}")
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ تراجع في الأداء (> {args.tolerance:.0%}):")
+        for key in regressions:
+            print(f"   {key}: {baseline[key]['seconds']:.4f}s → {results[key]['seconds']:.4f}s")
+        sys.exit(1)
+
+    if baseline:
+        print("\n✅ لا يوجد تراجع مقارنة بخط الأساس")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+benchmarks/stress_user_store.py - Concurrent User Store Stress Test
+عدة عمليات × عدة خيوط تستدعي add_user و update_user على نفس مخزن المستخدمين،
+ثم التحقق من عدم ضياع أي تحديث وأن الملف ما زال JSON سليماً
+
+python benchmarks/stress_user_store.py [processes] [threads] [ops_per_thread]
+USER_STORE_BACKEND=sqlite python benchmarks/stress_user_store.py
+"""
+
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# الاختبار يقيس مسار الكتابة وليس تكلفة KDF
+os.environ.setdefault('SCRYPT_N', '1024')
+
+
+def worker(args):
+    users_file, process_no, threads, ops = args
+
+    from utils.user_management import UserManager
+
+    mgr = UserManager(users_file=users_file)
+    failures = []
+
+    def hammer(thread_no):
+        for op in range(ops):
+            username = f"user_{process_no}_{thread_no}_{op}"
+            success, message = mgr.add_user(username, 'secret123', username, 'viewer')
+            if not success:
+                failures.append((username, message))
+                continue
+
+            success, message = mgr.update_user(username, current_user_role='admin',
+                                               name=f"updated {username}")
+            if not success:
+                failures.append((username, message))
+
+    pool = [threading.Thread(target=hammer, args=(n,)) for n in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+    return failures
+
+
+def stored_users(users_file):
+    """المستخدمون كما في المخزن نفسه، وليس من نسخة هذه العملية في الذاكرة
+
+    نسخة JSON في الذاكرة لا تعيد فحص الملف قبل USERS_RELOAD_INTERVAL، فنقرأ الملف مباشرة
+    (وهذا يتحقق أيضاً من أنه ما زال JSON سليماً).
+    """
+    if os.getenv('USER_STORE_BACKEND', 'json').lower() not in ('sqlite', 'postgres'):
+        with open(users_file, encoding='utf-8') as f:
+            return json.load(f)
+
+    from utils.user_backends import get_user_backend
+    return get_user_backend(users_file).list_users()
+
+
+def main(processes=4, threads=8, ops=25):
+    workdir = tempfile.mkdtemp(prefix='users_stress_')
+    os.chdir(workdir)
+    users_file = os.path.join(workdir, 'data', 'users.json')
+
+    # إنشاء الملف والمستخدمين الافتراضيين قبل بدء الضغط
+    from utils.user_management import UserManager
+    UserManager(users_file=users_file)
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(worker, [(users_file, p, threads, ops) for p in range(processes)])
+    elapsed = time.perf_counter() - start
+
+    failures = [f for result in results for f in result]
+    users = stored_users(users_file)
+
+    expected = {f"user_{p}_{t}_{o}" for p in range(processes) for t in range(threads) for o in range(ops)}
+    missing = expected - users.keys()
+    not_updated = [u for u in expected & users.keys() if users[u]['name'] != f"updated {u}"]
+
+    total_ops = len(expected) * 2
+    print(f"{processes} processes × {threads} threads × {ops} ops: "
+          f"{total_ops} writes in {elapsed:.2f}s ({total_ops / elapsed:.0f} writes/s)")
+    print(f"failures={len(failures)} missing={len(missing)} not_updated={len(not_updated)}")
+
+    if failures or missing or not_updated:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,159 @@
+"""
+benchmarks/synthetic.py - Synthetic Products Dataset
+جدول منتجات اصطناعي بنفس أعمدة Database.get_products، وتحميله في PostgreSQL أو SQLite بديل
+"""
+
+import io
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import Database  # noqa: E402
+
+COLUMNS = [
+    'id', 'product_id', 'name', 'url', 'current_price', 'old_price', 'discount_percentage',
+    'category', 'image_url', 'last_updated', 'is_deleted', 'is_out_of_stock', 'is_hidden',
+    'last_deep_check', 'created_at'
+]
+TIMESTAMP_COLUMNS = ['last_updated', 'last_deep_check', 'created_at']
+
+BRANDS = ['سامسونج', 'أبل', 'هواوي', 'شاومي', 'ال جي', 'سوني', 'فيليبس', 'توشيبا', 'لينوفو', 'ديل']
+PRODUCTS = ['شاشة', 'ثلاجة', 'غسالة', 'مكيف', 'جوال', 'لابتوب', 'سماعة', 'ساعة ذكية', 'مكنسة', 'فرن']
+DETAILS = ['أسود', 'أبيض', 'فضي', '128 جيجا', '256 جيجا', '55 بوصة', '65 بوصة', 'انفرتر', 'برو', 'ماكس']
+CATEGORIES = [f'{product} - {group}' for product in PRODUCTS for group in ('أساسي', 'مميز', 'عروض', 'مستعمل')]
+
+POSTGRES_TYPES = {
+    'id': 'BIGINT PRIMARY KEY',
+    'product_id': 'TEXT',
+    'name': 'TEXT',
+    'url': 'TEXT',
+    'current_price': 'NUMERIC',
+    'old_price': 'NUMERIC',
+    'discount_percentage': 'NUMERIC',
+    'category': 'TEXT',
+    'image_url': 'TEXT',
+    'last_updated': 'TIMESTAMPTZ',
+    'is_deleted': 'BOOLEAN',
+    'is_out_of_stock': 'BOOLEAN',
+    'is_hidden': 'BOOLEAN',
+    'last_deep_check': 'TIMESTAMPTZ',
+    'created_at': 'TIMESTAMPTZ',
+}
+
+# الجدول الاصطناعي في PostgreSQL يُنشأ في schema منفصلة حتى لا يلمس جدول products الحقيقي
+BENCH_SCHEMA = 'bench'
+
+
+def make_products(rows, seed=42, now=None):
+    """جدول منتجات اصطناعي (نفس النسب تقريباً: 5% محذوف، 15% نافد، 5% مخفي، 5% بلا سعر)"""
+    rng = np.random.default_rng(seed)
+    now = now or datetime(2025, 1, 1)
+
+    brand = np.asarray(BRANDS, dtype=object)[rng.integers(0, len(BRANDS), rows)]
+    product = np.asarray(PRODUCTS, dtype=object)[rng.integers(0, len(PRODUCTS), rows)]
+    detail = np.asarray(DETAILS, dtype=object)[rng.integers(0, len(DETAILS), rows)]
+    model = rng.integers(100, 10_000, rows).astype(str).astype(object)
+    names = product + ' ' + brand + ' ' + detail + ' ' + model
+
+    current_price = rng.uniform(20, 9000, rows).round(2)
+    current_price[rng.random(rows) < 0.05] = np.nan
+    discount = np.where(rng.random(rows) < 0.3, rng.integers(5, 60, rows), np.nan)
+    old_price = np.where(np.isnan(discount), np.nan, (current_price / (1 - discount / 100)).round(2))
+
+    last_updated = now - pd.to_timedelta(rng.uniform(0, 30 * 86400, rows), unit='s')
+    created_at = last_updated - pd.to_timedelta(rng.uniform(0, 365 * 86400, rows), unit='s')
+    ids = np.arange(1, rows + 1)
+
+    df = pd.DataFrame({
+        'id': ids,
+        'product_id': pd.Series(ids).map('P{:07d}'.format),
+        'name': names,
+        'url': pd.Series(ids).map('https://example.com/p/{}'.format),
+        'current_price': current_price,
+        'old_price': old_price,
+        'discount_percentage': discount,
+        'category': np.asarray(CATEGORIES, dtype=object)[rng.integers(0, len(CATEGORIES), rows)],
+        'image_url': pd.Series(ids).map('https://example.com/img/{}.jpg'.format),
+        'last_updated': last_updated,
+        'is_deleted': rng.random(rows) < 0.05,
+        'is_out_of_stock': rng.random(rows) < 0.15,
+        'is_hidden': rng.random(rows) < 0.05,
+        'last_deep_check': last_updated - timedelta(hours=1),
+        'created_at': created_at,
+    })
+    return df[COLUMNS]
+
+
+class SQLiteDatabase(Database):
+    """Database فوق SQLite بدلاً من PostgreSQL (لقياس مراحل pandas بدون خادم)
+
+    الاستعلامات نفسها تعمل في SQLite >= 3.30 (FILTER، NULLS LAST) ما عدا البحث و ids.
+    """
+
+    def __init__(self, path):
+        self.connection_string = f"sqlite:///{path}"
+        self.path = path
+        self.pool = None
+
+    def read_sql(self, query, params=None):
+        query = re.sub(r'%s', '?', query).replace('%%', '%')
+        with sqlite3.connect(self.path) as conn:
+            columns = [c for c in TIMESTAMP_COLUMNS if re.search(rf'\b{c}\b', query)]
+            return pd.read_sql(query, conn, params=params or None, parse_dates=columns or None)
+
+    def copy_sql(self, query, params=None):
+        # لا يوجد COPY في SQLite
+        return self.read_sql(query, params)
+
+    def probe_data_version(self):
+        # بدون جدول products_version: آخر last_updated + عدد الصفوف
+        row = self.read_sql("SELECT max(last_updated) AS last_updated, count(*) AS total FROM products").iloc[0]
+        return f"{row['last_updated']}|{int(row['total'])}"
+
+
+def load_sqlite(df, path):
+    """كتابة الجدول الاصطناعي إلى ملف SQLite وإرجاع SQLiteDatabase عليه"""
+    if os.path.exists(path):
+        os.remove(path)
+
+    with sqlite3.connect(path) as conn:
+        df.to_sql('products', conn, index=False)
+        conn.execute("CREATE INDEX products_last_updated_idx ON products (last_updated)")
+
+    return SQLiteDatabase(path)
+
+
+def load_postgres(df, dsn):
+    """تحميل الجدول الاصطناعي إلى BENCH_SCHEMA.products عبر COPY وإرجاع Database عليه"""
+    import psycopg2
+    from psycopg2.extensions import make_dsn
+
+    bench_dsn = make_dsn(dsn, options=f'-c search_path={BENCH_SCHEMA}')
+
+    with psycopg2.connect(bench_dsn) as conn, conn.cursor() as cur:
+        columns = ', '.join(f'{name} {sql_type}' for name, sql_type in POSTGRES_TYPES.items())
+        cur.execute(f"CREATE SCHEMA IF NOT EXISTS {BENCH_SCHEMA}")
+        cur.execute(f"DROP TABLE IF EXISTS {BENCH_SCHEMA}.products")
+        cur.execute(f"CREATE TABLE {BENCH_SCHEMA}.products ({columns})")
+
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cur.copy_expert(
+            f"COPY {BENCH_SCHEMA}.products ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+
+        cur.execute(f"CREATE INDEX ON {BENCH_SCHEMA}.products (last_updated)")
+        cur.execute(f"ANALYZE {BENCH_SCHEMA}.products")
+    conn.close()
+
+    # Database يقرأ الاتصال من SUPABASE_URL (نفس الـ dsn لكل الأحجام، فيُعاد استخدام نفس المجمع)
+    os.environ['SUPABASE_URL'] = bench_dsn
+    return Database()
@@ -5,35 +5,10 @@ utils/auth.py - Premium Authentication System
 
 import streamlit as st
 from .user_management import UserManager
-import base64
+from .static_assets import logo_url
 
 user_mgr = UserManager()
 
-def get_logo_base64():
-    try:
-        path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static", "logo.png")
-        with open(path, "rb") as f:
-            return base64.b64encode(f.read()).decode()
-    except:
-        return None
-
-logo_b64 = get_logo_base64()
-
-if logo_b64:
-    st.markdown(f"""
-    <div class="login-logo">
-        <img src="data:image/png;base64,{logo_b64}"
-             style="width: 100px; height: 100px; border-radius: 20px;
-                    box-shadow: 0 10px 30px rgba(102,126,234,0.4);">
-    </div>
-    """, unsafe_allow_html=True)
-else:
-    st.markdown("""
-    <div class="login-logo">
-        <div class="login-logo-icon">📊</div>
-    </div>
-    """, unsafe_allow_html=True)
-
 def check_authentication():
     """التحقق من حالة تسجيل الدخول"""
     return st.session_state.get('authenticated', False)
@@ -215,16 +190,24 @@ def login_page():
     st.markdown('<div class="login-container">', unsafe_allow_html=True)
 
     # الشعار
-    # الشعار
-    st.markdown("""
-    <div class="login-logo">
-        <img src="https://i.imgur.com/YOUR_LOGO.png"
-            style="width: 100px; height: 100px; border-radius: 20px;
-                    box-shadow: 0 10px 30px rgba(102,126,234,0.4);"
-            onerror="this.style.display='none'; this.nextElementSibling.style.display='flex';">
-        <div class="login-logo-icon" style="display: none;">📊</div>
-    </div>
-    """, unsafe_allow_html=True)
+    logo = logo_url(100)
+
+    if logo:
+        st.markdown(f"""
+        <div class="login-logo">
+            <img src="{logo}"
+                style="width: 100px; height: 100px; border-radius: 20px;
+                        box-shadow: 0 10px 30px rgba(102,126,234,0.4);"
+                onerror="this.style.display='none'; this.nextElementSibling.style.display='flex';">
+            <div class="login-logo-icon" style="display: none;">📊</div>
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        st.markdown("""
+        <div class="login-logo">
+            <div class="login-logo-icon">📊</div>
+        </div>
+        """, unsafe_allow_html=True)
 
     # العنوان
     st.markdown('<h1 class="login-title">Janoubco Monitor</h1>', unsafe_allow_html=True)
@@ -0,0 +1,121 @@
+"""
+utils/changes.py - Product Change Detection
+اكتشاف التغييرات (جديد، تغير السعر، نفد، أُخفي، حُذف) بمقارنة الصفوف المتغيرة فقط
+"""
+
+import os
+
+import pandas as pd
+
+# أنواع التغيير بالترتيب المعروض
+CHANGE_KINDS = {
+    'new': 'منتج جديد',
+    'price_changed': 'تغير السعر',
+    'out_of_stock': 'نفد',
+    'hidden': 'أُخفي',
+    'deleted': 'حُذف',
+}
+
+# الحالة الجديدة التي تعني كل نوع من انتقالات الحالة
+STATUS_KINDS = {
+    'out_of_stock': 'نافد',
+    'hidden': 'مخفي',
+    'deleted': 'محذوف',
+}
+
+CHANGE_COLUMNS = ['changed_at', 'kind', 'id', 'product_id', 'name', 'old_price', 'new_price']
+
+# مدة الاحتفاظ بسجل التغييرات في الذاكرة، والحد الأعلى لصفوف الاستعلام المباشر
+CHANGES_RETENTION_HOURS = int(os.getenv('CHANGES_RETENTION_HOURS', '72'))
+CHANGES_MAX_ROWS = int(os.getenv('CHANGES_MAX_ROWS', '5000'))
+
+
+def empty_changes():
+    return pd.DataFrame(columns=CHANGE_COLUMNS)
+
+
+def align_timestamp(value, like):
+    """تحويل value إلى Timestamp قابل للمقارنة مع عمود التواريخ like (بمنطقة زمنية أو بدونها)"""
+    value = pd.Timestamp(value)
+    column_tz = getattr(like.dtype, 'tz', None)
+
+    if column_tz is not None and value.tzinfo is None:
+        return value.tz_localize(column_tz)
+    if column_tz is None and value.tzinfo is not None:
+        return value.tz_convert(None)
+    return value
+
+
+def _events(rows, kind, old_price):
+    return pd.DataFrame({
+        'changed_at': rows['last_updated'],
+        'kind': kind,
+        'id': rows['id'],
+        'product_id': rows['product_id'],
+        'name': rows['name'],
+        'old_price': old_price,
+        'new_price': rows['current_price'],
+    })
+
+
+def diff_products(previous, current):
+    """أحداث التغيير بين الصفوف السابقة (من النسخة المحفوظة) والصفوف الجديدة بنفس id
+
+    previous يكفي أن يحتوي الصفوف التي تغيرت فقط، فالتكلفة تتناسب مع عدد التغييرات.
+    """
+    if current.empty:
+        return empty_changes()
+
+    before = previous[['id', 'current_price', 'status']].rename(
+        columns={'current_price': 'old_price', 'status': 'old_status'}
+    )
+    merged = current[['id', 'product_id', 'name', 'current_price', 'status', 'last_updated']].merge(
+        before, on='id', how='left', indicator=True
+    )
+
+    is_new = merged['_merge'].eq('left_only')
+    old_price = pd.to_numeric(merged['old_price'], errors='coerce')
+    new_price = pd.to_numeric(merged['current_price'], errors='coerce')
+    same_price = old_price.eq(new_price) | (old_price.isna() & new_price.isna())
+
+    status = merged['status'].astype(object)
+    status_changed = ~is_new & status.ne(merged['old_status'].astype(object))
+
+    events = [
+        _events(merged[is_new], 'new', None),
+        _events(merged[~is_new & ~same_price], 'price_changed', old_price[~is_new & ~same_price]),
+    ]
+    for kind, new_status in STATUS_KINDS.items():
+        mask = status_changed & status.eq(new_status)
+        events.append(_events(merged[mask], kind, old_price[mask]))
+
+    return pd.concat(events, ignore_index=True).sort_values('changed_at', ascending=False, kind='stable')
+
+
+def classify_changes(rows, since):
+    """تصنيف الصفوف المتغيرة منذ since بدون نسخة سابقة محفوظة
+
+    منتج جديد إذا أُنشئ بعد since، وتغير السعر إذا اختلف عن آخر سعر في price_history قبل since
+    (إن وُجد)، وانتقالات الحالة حسب الحالة الحالية للصفوف التي تحدثت خلال الفترة.
+    """
+    if rows.empty:
+        return empty_changes()
+
+    created_at = rows['created_at']
+    is_new = created_at.notna() & created_at.ge(align_timestamp(since, created_at))
+
+    old_price = pd.to_numeric(rows['previous_price'], errors='coerce')
+    new_price = pd.to_numeric(rows['current_price'], errors='coerce')
+    price_changed = ~is_new & old_price.notna() & old_price.ne(new_price)
+
+    status = rows['status'].astype(object)
+
+    events = [
+        _events(rows[is_new], 'new', None),
+        _events(rows[price_changed], 'price_changed', old_price[price_changed]),
+    ]
+    for kind, new_status in STATUS_KINDS.items():
+        mask = ~is_new & status.eq(new_status)
+        events.append(_events(rows[mask], kind, None))
+
+    return pd.concat(events, ignore_index=True).sort_values('changed_at', ascending=False, kind='stable')
@@ -0,0 +1,170 @@
+"""
+utils/credentials.py - Password Hashing & Verification
+تشفير كلمات المرور بـ KDF بطيء (scrypt / PBKDF2) مع ملح لكل كلمة مرور
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# إعدادات التكلفة الحالية؛ الهاشات الأقدم أو الأضعف تُحدّث تلقائياً عند تسجيل الدخول
+DEFAULT_SCHEME = os.getenv('PASSWORD_HASH_SCHEME', 'scrypt')
+SCRYPT_N = int(os.getenv('SCRYPT_N', str(2 ** 14)))
+SCRYPT_R = int(os.getenv('SCRYPT_R', '8'))
+SCRYPT_P = int(os.getenv('SCRYPT_P', '1'))
+PBKDF2_ITERATIONS = int(os.getenv('PBKDF2_ITERATIONS', '600000'))
+SALT_BYTES = 16
+
+# عدد محدود من الخيوط لعمليات KDF حتى لا تستهلك تسجيلات الدخول المتزامنة كل المعالج والذاكرة
+_kdf_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv('KDF_WORKERS', '2')), thread_name_prefix='kdf'
+)
+
+
+def _b64encode(raw):
+    return base64.b64encode(raw).decode('ascii')
+
+
+def _b64decode(text):
+    return base64.b64decode(text.encode('ascii'))
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p,
+        maxmem=256 * n * r + 1024 * 1024, dklen=32
+    )
+
+
+def _pbkdf2(password, salt, iterations):
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+
+
+def _derive(password, stored):
+    """حساب الهاش بنفس خوارزمية ومعاملات الهاش المخزن (للتحقق)"""
+    parts = stored.split('$')
+
+    if parts[0] == 'scrypt' and len(parts) == 6:
+        n, r, p = (int(x) for x in parts[1:4])
+        return _scrypt(password, _b64decode(parts[4]), n, r, p), _b64decode(parts[5])
+
+    if parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+        return _pbkdf2(password, _b64decode(parts[2]), int(parts[1])), _b64decode(parts[3])
+
+    # الصيغة القديمة: SHA-256 بدون ملح
+    return hashlib.sha256(password.encode()).digest(), bytes.fromhex(stored)
+
+
+def _hash(password, scheme):
+    salt = os.urandom(SALT_BYTES)
+
+    if scheme == 'pbkdf2_sha256':
+        digest = _pbkdf2(password, salt, PBKDF2_ITERATIONS)
+        return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64encode(salt)}${_b64encode(digest)}"
+
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def _verify(password, stored):
+    try:
+        computed, expected = _derive(password, stored)
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(computed, expected)
+
+
+def hash_password(password, scheme=None):
+    """تشفير كلمة مرور جديدة (يعمل في مجمع خيوط KDF)"""
+    return _kdf_pool.submit(_hash, password, scheme or DEFAULT_SCHEME).result()
+
+
+def verify_password(password, stored):
+    """التحقق من كلمة المرور مقابل أي صيغة مخزنة (يعمل في مجمع خيوط KDF)"""
+    if not stored:
+        return False
+    return _kdf_pool.submit(_verify, password, stored).result()
+
+
+def hash_version(stored):
+    """الخوارزمية ومعاملات التكلفة (بدون الملح والهاش)"""
+    parts = stored.split('$')
+    if parts[0] == 'scrypt':
+        return '$'.join(parts[:4])
+    if parts[0] == 'pbkdf2_sha256':
+        return '$'.join(parts[:2])
+    return 'sha256'
+
+
+def current_hash_version():
+    if DEFAULT_SCHEME == 'pbkdf2_sha256':
+        return f"pbkdf2_sha256${PBKDF2_ITERATIONS}"
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}"
+
+
+def needs_rehash(stored):
+    """هل الهاش قديم أو أضعف من الإعدادات الحالية؟"""
+    return hash_version(stored) != current_hash_version()
+
+
+class VerifiedCredentialCache:
+    """كاش قصير العمر لعمليات التحقق الناجحة حتى لا يُعاد حساب KDF لنفس البيانات
+
+    لا تُخزن كلمة المرور نفسها، بل HMAC لها بمفتاح عشوائي خاص بالعملية.
+    المفتاح يتضمن الهاش المخزن، فتغيير كلمة المرور يُبطل الإدخال تلقائياً.
+    """
+
+    def __init__(self, ttl=300, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._secret = os.urandom(32)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, username, password, stored):
+        tag = hmac.new(self._secret, password.encode(), hashlib.sha256).digest()
+        return (username.lower(), stored, tag)
+
+    def check(self, username, password, stored):
+        key = self._key(username, password, stored)
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def add(self, username, password, stored):
+        key = self._key(username, password, stored)
+        with self._lock:
+            self._entries[key] = time.monotonic() + self.ttl
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+verified_cache = VerifiedCredentialCache(ttl=int(os.getenv('VERIFIED_CREDENTIALS_TTL', '300')))
+
+
+def verify_user_password(username, password, stored):
+    """التحقق مع استخدام كاش التحققات الناجحة"""
+    if verified_cache.check(username, password, stored):
+        return True
+
+    if verify_password(password, stored):
+        verified_cache.add(username, password, stored)
+        return True
+
+    return False
@@ -2,142 +2,573 @@
 utils/database.py - Database Connection & Operations
 """
 
+import functools
 import os
-import psycopg2
+import time
+import uuid
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 import streamlit as st
 from dotenv import load_dotenv
 
+from .changes import CHANGES_MAX_ROWS, classify_changes, empty_changes
+from .db_pool import get_pool
+from .export import write_export
+from .migrations import has_data_version, has_price_history, has_search_schema
+from .perf import frame_bytes, frame_rows, perf
+from .pg_copy import copy_query, frame_from_rows, register_fast_types
+from .product_cache import get_product_cache
+from .product_frame import compact_dtypes, memory_report
+from .search import normalize_arabic
+
 load_dotenv()
 
+# الأعمدة التي تحتاجها لوحة التحكم من جدول المنتجات
+PRODUCT_COLUMNS = """
+    id,
+    product_id,
+    name,
+    url,
+    current_price,
+    old_price,
+    discount_percentage,
+    category,
+    image_url,
+    last_updated,
+    is_deleted,
+    is_out_of_stock,
+    is_hidden,
+    last_deep_check,
+    created_at
+"""
+
+# شروط الحالات بنفس أولوية العرض: محذوف ثم نافد ثم مخفي ثم متوفر
+STATUS_CONDITIONS = {
+    'محذوف': "COALESCE(is_deleted, FALSE)",
+    'نافد': "NOT COALESCE(is_deleted, FALSE) AND COALESCE(is_out_of_stock, FALSE)",
+    'مخفي': ("NOT COALESCE(is_deleted, FALSE) AND NOT COALESCE(is_out_of_stock, FALSE)"
+             " AND COALESCE(is_hidden, FALSE)"),
+    'متوفر': ("NOT COALESCE(is_deleted, FALSE) AND NOT COALESCE(is_out_of_stock, FALSE)"
+              " AND NOT COALESCE(is_hidden, FALSE)"),
+}
+
+# الترتيب في الذاكرة لنتائج البحث: (العمود، تصاعدي)
+SORT_COLUMNS = {
+    'last_checked': ('last_updated', False),
+    'price_desc': ('current_price', False),
+    'price_asc': ('current_price', True),
+    'name_asc': ('name', True),
+    'name_desc': ('name', False),
+}
+
+# الإحصائيات تتغير ببطء، لذلك لها كاش مستقل عن قائمة المنتجات
+STATISTICS_TTL = int(os.getenv('STATISTICS_TTL', '60'))
+STATISTICS_KEYS = ['total', 'available', 'out_of_stock', 'hidden', 'deleted', 'categories']
+
+# قيم الحالة المعروضة (ترتيب فئات عمود status)
+STATUS_ORDER = ['متوفر', 'نافد', 'مخفي', 'محذوف']
+
+# خيارات الترتيب (id لضمان ترتيب ثابت بين الصفحات)
+SORT_OPTIONS = {
+    'last_checked': "last_updated DESC NULLS LAST, id",
+    'price_desc': "current_price DESC NULLS LAST, id",
+    'price_asc': "current_price ASC NULLS LAST, id",
+    'name_asc': "name ASC, id",
+    'name_desc': "name DESC, id",
+}
+
+# ترتيب نتائج البحث من جهة الخادم حسب التشابه (يحتاج نص البحث كمعامل)
+RELEVANCE_ORDER = "word_similarity(%s, search_normalize(name)) DESC, last_updated DESC NULLS LAST, id"
+
+# شرط البحث من جهة الخادم على الاسم الموحد (فهارس utils/migrations.py):
+# نص جزئي، أو تشابه trigram مع كلمة في الاسم (أخطاء إملائية)، أو كل الكلمات كاملة
+FULLTEXT_CONDITION = (
+    "(search_normalize(name) ILIKE %s"
+    " OR %s <%% search_normalize(name)"
+    " OR to_tsvector('simple', search_normalize(name)) @@ plainto_tsquery('simple', %s))"
+)
+
+# عدد الأيام المعروضة في منحنيات الأسعار
+PRICE_HISTORY_DAYS = int(os.getenv('PRICE_HISTORY_DAYS', '30'))
+PRICE_HISTORY_COLUMNS = ['product_id', 'day', 'min_price', 'max_price', 'last_price']
+
+# استراتيجية البحث: memory (فهرس داخل العملية) / server (PostgreSQL) / auto (حسب حجم الكتالوج)
+SEARCH_STRATEGY = os.getenv('SEARCH_STRATEGY', 'auto')
+SEARCH_INDEX_MAX_ROWS = int(os.getenv('SEARCH_INDEX_MAX_ROWS', '200000'))
+
+# طريقة تحميل جدول المنتجات: copy (COPY ... TO STDOUT + قارئ CSV) أو read_sql (pd.read_sql صفاً صفاً)
+PRODUCTS_LOADER = os.getenv('PRODUCTS_LOADER', 'copy')
+
+# عدد الصفوف في كل دفعة من cursor الخادم في القراءة المتدفقة (stream_sql)
+STREAM_ITERSIZE = int(os.getenv('STREAM_ITERSIZE', '5000'))
+
+# نسخة البيانات تُفحص مرة كل DATA_VERSION_TTL ثانية على الأكثر لكل قاعدة بيانات في العملية
+DATA_VERSION_TTL = float(os.getenv('DATA_VERSION_TTL', '2'))
+_data_versions = {}
+
+# مفتاح الكاش عندما يتعذر فحص النسخة (قاعدة البيانات غير متاحة)
+DATA_VERSION_UNAVAILABLE = 'unavailable'
+
+
+def cache_by_data_version(ttl):
+    """st.cache_data مع نسخة بيانات المنتجات ضمن مفتاح الكاش
+
+    الجدول الذي لم يتغير يكلف فحص النسخة فقط، وأي تغيير يظهر في الطلب التالي دون انتظار ttl
+    (ttl يحدد فقط متى تُحذف نتائج النسخ القديمة من الذاكرة).
+    """
+    def decorator(func):
+        def cached(_self, data_version, *args, **kwargs):
+            return func(_self, *args, **kwargs)
+
+        # st.cache_data يميز الدوال بالاسم والكود، والدوال الداخلية المتطابقة تتشارك نفس الكاش
+        cached.__module__ = func.__module__
+        cached.__qualname__ = func.__qualname__
+        cached = st.cache_data(ttl=ttl)(cached)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            try:
+                data_version = self.get_data_version()
+            except Exception:
+                # قاعدة البيانات غير متاحة: الدالة نفسها تعرض الخطأ وتعيد قيمة فارغة، ونتيجتها تُحفظ
+                # بمفتاح خاص حتى لا يتكرر انتظار الاتصال في كل طلب ولا تختلط بنتائج نسخة حقيقية
+                data_version = DATA_VERSION_UNAVAILABLE
+            return cached(self, data_version, *args, **kwargs)
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorator
+
+
+def _escape_like(text):
+    """تهريب الرموز الخاصة في LIKE"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def build_product_filters(status=None, category=None, search=None, ids=None, fulltext=False):
+    """بناء جملة WHERE ومعاملاتها من الفلاتر
+
+    fulltext: البحث بفهارس pg_trgm / tsvector على الاسم الموحد بدلاً من ILIKE على الاسم كما هو.
+    """
+    conditions = []
+    params = []
+
+    if ids is not None:
+        conditions.append("id = ANY(%s)")
+        params.append(list(ids))
+
+    if status:
+        if status not in STATUS_CONDITIONS:
+            raise ValueError(f"حالة غير معروفة: {status}")
+        conditions.append(STATUS_CONDITIONS[status])
+
+    if category:
+        conditions.append("category = %s")
+        params.append(category)
+
+    if search and fulltext:
+        normalized = normalize_arabic(search)
+        conditions.append(FULLTEXT_CONDITION)
+        params += [f"%{_escape_like(normalized)}%", normalized, normalized]
+    elif search:
+        conditions.append("name ILIKE %s")
+        params.append(f"%{_escape_like(search)}%")
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+
+def build_product_order(sort, search=None, fulltext=False):
+    """جملة ORDER BY ومعاملاتها؛ الترتيب حسب الصلة متاح فقط مع البحث من جهة الخادم"""
+    if sort == 'relevance':
+        if search and fulltext:
+            return RELEVANCE_ORDER, [normalize_arabic(search)]
+        sort = 'last_checked'
+    return SORT_OPTIONS[sort], []
+
+
+def derive_status(df):
+    """اشتقاق عمود الحالة من أعمدة is_* دون حلقة على الصفوف"""
+    def flag(column):
+        return df[column].eq(True).to_numpy(dtype=bool, na_value=False)
+
+    # الترتيب هنا يحدد الأولوية: محذوف ثم نافد ثم مخفي
+    codes = np.select(
+        [flag('is_deleted'), flag('is_out_of_stock'), flag('is_hidden')],
+        [STATUS_ORDER.index('محذوف'), STATUS_ORDER.index('نافد'), STATUS_ORDER.index('مخفي')],
+        default=STATUS_ORDER.index('متوفر')
+    )
+    return pd.Categorical.from_codes(codes, categories=STATUS_ORDER)
+
+
+@perf.instrument('products.derive_columns', rows=frame_rows)
+def add_derived_columns(df):
+    """ضغط أنواع الأعمدة وإضافة عمود الحالة (السعر يُنسّق عند العرض فقط)"""
+    compact_dtypes(df)
+
+    # تحويل الحالات إلى نص عربي
+    df['status'] = derive_status(df)
+
+    return df
+
+
 class Database:
-    def __init__(self):
+    def __init__(self, min_connections=None, max_connections=None):
         self.connection_string = os.getenv('SUPABASE_URL')
+        # مجمع اتصالات مشترك بين كل نسخ Database في نفس العملية
+        self.pool = get_pool(self.connection_string, min_connections, max_connections)
+
+    @perf.instrument('db.read_sql', rows=frame_rows, nbytes=frame_bytes)
+    def read_sql(self, query, params=None):
+        """تنفيذ استعلام قراءة عبر مجمع الاتصالات وإرجاع DataFrame"""
+        return self.pool.run(lambda conn: pd.read_sql(query, conn, params=params or None))
+
+    def copy_sql(self, query, params=None):
+        """مثل read_sql لكن عبر COPY ... TO STDOUT (أسرع بكثير مع النتائج الكبيرة)"""
+        with perf.timed('db.copy_sql') as span:
+            df, span.bytes = self.pool.run(lambda conn: copy_query(conn, query, params))
+            span.rows = len(df)
+        return df
+
+    def stream_sql(self, query, params=None, itersize=None):
+        """قراءة نتيجة استعلام كدفعات DataFrame عبر cursor مسمى من جهة الخادم
 
-    @st.cache_data(ttl=300)
-    def get_products(_self):
-        """جلب جميع المنتجات من قاعدة البيانات"""
+        لا يصل من الخادم إلا itersize صف في كل مرة، فلا تكون النتيجة كاملة في الذاكرة أبداً.
+        النتيجة الفارغة تعطي دفعة واحدة فارغة (بالأعمدة) حتى يعرف المستهلك شكل البيانات.
+        """
+        itersize = itersize or STREAM_ITERSIZE
+
+        with self.pool.connection() as conn:
+            with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+                cur.itersize = itersize
+                register_fast_types(cur)
+                cur.execute(query, params or None)
+
+                first = True
+                while True:
+                    with perf.timed('db.stream_fetch') as span:
+                        rows = cur.fetchmany(itersize)
+                        span.rows = len(rows)
+                    if rows or first:
+                        columns = [(desc.name, desc.type_code) for desc in cur.description]
+                        yield frame_from_rows(rows, columns)
+                    # دفعة ناقصة تعني نهاية النتيجة (بدون FETCH إضافي)
+                    if len(rows) < itersize:
+                        break
+                    first = False
+
+    def fetch_products(self, since=None):
+        """قراءة المنتجات من قاعدة البيانات (كلها أو المتغيرة منذ since فقط)"""
+        where = "WHERE last_updated >= %s" if since is not None else ""
+        query = f"""
+            SELECT {PRODUCT_COLUMNS}
+            FROM products
+            {where}
+            ORDER BY last_updated DESC NULLS LAST
+        """
+
+        with perf.timed('products.fetch_full' if since is None else 'products.fetch_delta') as span:
+            load = self.copy_sql if PRODUCTS_LOADER == 'copy' else self.read_sql
+            df = add_derived_columns(load(query, [since] if since is not None else None))
+            span.rows = len(df)
+        return df
+
+    def get_products(self):
+        """جلب جميع المنتجات (من الكاش التزايدي)"""
+        cache = get_product_cache(self.connection_string)
         try:
-            conn = psycopg2.connect(_self.connection_string)
-
-            query = """
-                SELECT
-                    id,
-                    product_id,
-                    name,
-                    url,
-                    current_price,
-                    old_price,
-                    discount_percentage,
-                    category,
-                    image_url,
-                    last_updated,
-                    is_deleted,
-                    is_out_of_stock,
-                    is_hidden,
-                    last_deep_check,
-                    created_at
+            return cache.get(self)
+
+        except Exception as e:
+            if cache.frame is not None:
+                st.warning(f"⚠️ تعذر تحديث البيانات، يتم عرض آخر نسخة محفوظة: {str(e)}")
+                return cache.frame
+            st.error(f"❌ خطأ في الاتصال بقاعدة البيانات: {str(e)}")
+            return pd.DataFrame()
+
+    def products_memory_report(self):
+        """استهلاك نسخة المنتجات في هذه العملية للذاكرة لكل عمود، أو None إذا لم تُحمّل بعد"""
+        frame = get_product_cache(self.connection_string).frame
+        return None if frame is None else memory_report(frame)
+
+    def search_strategy(self, total_products):
+        """memory: فهرس البحث داخل العملية، server: البحث في PostgreSQL
+
+        في وضع auto يُستخدم البحث من جهة الخادم إذا كان الكتالوج أكبر من أن يُحمّل في كل عملية.
+        """
+        if SEARCH_STRATEGY in ('memory', 'server'):
+            return SEARCH_STRATEGY
+        return 'memory' if total_products <= SEARCH_INDEX_MAX_ROWS else 'server'
+
+    def fulltext_search_enabled(self):
+        """هل فهارس البحث (pg_trgm / tsvector) مطبقة؟ وإلا يُستخدم ILIKE العادي"""
+        return has_search_schema(self)
+
+    def search_products(self, search, status=None, category=None, sort='relevance'):
+        """البحث في الفهرس داخل الذاكرة (استراتيجية memory)
+
+        ترجع (الإطار، مواقع الصفوف المطابقة) حتى تُبنى صفحة العرض فقط من المواقع المطلوبة.
+        """
+        cache = get_product_cache(self.connection_string)
+        try:
+            frame, index = cache.get_with_index(self)
+        except Exception as e:
+            st.error(f"❌ خطأ في الاتصال بقاعدة البيانات: {str(e)}")
+            return pd.DataFrame(), np.empty(0, dtype=np.int32)
+
+        with perf.timed('search.index') as span:
+            positions = index.search(search)
+            span.rows = len(positions)
+
+        if status:
+            positions = positions[frame['status'].to_numpy()[positions] == status]
+
+        if category:
+            positions = positions[frame['category'].to_numpy()[positions] == category]
+
+        if sort != 'relevance' and len(positions):
+            column, ascending = SORT_COLUMNS[sort]
+            values = frame[column].iloc[positions].reset_index(drop=True)
+            order = values.sort_values(ascending=ascending, na_position='last', kind='stable').index
+            positions = positions[order.to_numpy()]
+
+        return frame, positions
+
+    @cache_by_data_version(ttl=300)
+    def query_products(_self, status=None, category=None, search=None,
+                       sort='last_checked', limit=None, offset=0, ids=None):
+        """جلب المنتجات المفلترة والمرتبة مباشرة من قاعدة البيانات"""
+        try:
+            fulltext = bool(search) and _self.fulltext_search_enabled()
+            where, params = build_product_filters(status, category, search, ids, fulltext)
+            order, order_params = build_product_order(sort, search, fulltext)
+
+            query = f"""
+                SELECT {PRODUCT_COLUMNS}
                 FROM products
-                ORDER BY last_updated DESC NULLS LAST
+                {where}
+                ORDER BY {order}
             """
+            params += order_params
 
-            df = pd.read_sql(query, conn)
-            conn.close()
+            if limit is not None:
+                query += " LIMIT %s OFFSET %s"
+                params += [int(limit), int(offset)]
 
-            # تحويل الحالات إلى نص عربي
-            def get_status(row):
-                if row['is_deleted']:
-                    return 'محذوف'
-                elif row['is_out_of_stock']:
-                    return 'نافد'
-                elif row['is_hidden']:
-                    return 'مخفي'
-                else:
-                    return 'متوفر'
+            df = _self.read_sql(query, params)
+            return add_derived_columns(df)
 
-            df['status'] = df.apply(get_status, axis=1)
+        except Exception as e:
+            st.error(f"❌ خطأ في الاتصال بقاعدة البيانات: {str(e)}")
+            return pd.DataFrame()
 
-            # تنسيق السعر
-            df['price'] = df['current_price'].apply(lambda x: f"{x:.2f} ريال" if pd.notna(x) else "غير متاح")
+    @cache_by_data_version(ttl=300)
+    def count_products(_self, status=None, category=None, search=None, ids=None):
+        """عدد المنتجات المطابقة للفلاتر"""
+        try:
+            fulltext = bool(search) and _self.fulltext_search_enabled()
+            where, params = build_product_filters(status, category, search, ids, fulltext)
+            df = _self.read_sql(f"SELECT count(*) AS total FROM products {where}", params)
+            return int(df['total'].iloc[0])
 
-            # إعادة تسمية الأعمدة
-            df['last_checked'] = df['last_updated']
+        except Exception as e:
+            st.error(f"❌ خطأ في الاتصال بقاعدة البيانات: {str(e)}")
+            return 0
 
-            return df
+    @cache_by_data_version(ttl=STATISTICS_TTL)
+    def get_statistics(_self):
+        """حساب الإحصائيات باستعلام تجميعي واحد"""
+        query = f"""
+            SELECT
+                count(*) AS total,
+                count(*) FILTER (WHERE {STATUS_CONDITIONS['متوفر']}) AS available,
+                count(*) FILTER (WHERE {STATUS_CONDITIONS['نافد']}) AS out_of_stock,
+                count(*) FILTER (WHERE {STATUS_CONDITIONS['مخفي']}) AS hidden,
+                count(*) FILTER (WHERE {STATUS_CONDITIONS['محذوف']}) AS deleted,
+                count(DISTINCT category) AS categories
+            FROM products
+        """
+
+        try:
+            row = _self.read_sql(query).iloc[0]
+            return {key: int(row[key]) for key in STATISTICS_KEYS}
 
         except Exception as e:
             st.error(f"❌ خطأ في الاتصال بقاعدة البيانات: {str(e)}")
-            return pd.DataFrame()
+            return {key: 0 for key in STATISTICS_KEYS}
 
-    def get_statistics(self):
-        """حساب الإحصائيات"""
-        df = self.get_products()
-
-        if df.empty:
-            return {
-                'total': 0,
-                'available': 0,
-                'out_of_stock': 0,
-                'hidden': 0,
-                'deleted': 0,
-                'categories': 0
-            }
-
-        stats = {
-            'total': len(df),
-            'available': len(df[df['status'] == 'متوفر']),
-            'out_of_stock': len(df[df['status'] == 'نافد']),
-            'hidden': len(df[df['status'] == 'مخفي']),
-            'deleted': len(df[df['status'] == 'محذوف']),
-            'categories': df['category'].nunique() if 'category' in df.columns else 0
-        }
-
-        return stats
-
-    def get_categories(self):
+    @cache_by_data_version(ttl=300)
+    def get_categories(_self):
         """جلب قائمة الأقسام"""
-        df = self.get_products()
-        if df.empty or 'category' not in df.columns:
+        try:
+            df = _self.read_sql(
+                "SELECT DISTINCT category FROM products WHERE category IS NOT NULL ORDER BY category"
+            )
+            return df['category'].tolist()
+
+        except Exception as e:
+            st.error(f"❌ خطأ في الاتصال بقاعدة البيانات: {str(e)}")
             return []
-        categories = df['category'].dropna().unique().tolist()
-        return sorted(categories)
+
+    @cache_by_data_version(ttl=300)
+    def get_price_history(_self, product_ids, since=None):
+        """سجل أسعار عدة منتجات باستعلام واحد، مجمعاً يومياً (أقل / أعلى / آخر سعر)"""
+        if since is None:
+            since = datetime.now().astimezone() - timedelta(days=PRICE_HISTORY_DAYS)
+
+        ids = [str(product_id) for product_id in product_ids if pd.notna(product_id)]
+        if not ids:
+            return pd.DataFrame(columns=PRICE_HISTORY_COLUMNS)
+
+        query = """
+            SELECT
+                product_id,
+                date_trunc('day', ts) AS day,
+                min(price) AS min_price,
+                max(price) AS max_price,
+                (array_agg(price ORDER BY ts DESC))[1] AS last_price
+            FROM price_history
+            WHERE product_id = ANY(%s) AND ts >= %s
+            GROUP BY product_id, day
+            ORDER BY product_id, day
+        """
+
+        try:
+            # قبل تطبيق migration سجل الأسعار لا توجد بيانات لعرضها
+            if not has_price_history(_self):
+                return pd.DataFrame(columns=PRICE_HISTORY_COLUMNS)
+
+            df = _self.read_sql(query, [ids, since])
+            price_columns = ['min_price', 'max_price', 'last_price']
+            df[price_columns] = df[price_columns].astype(float)
+            return df
+
+        except Exception as e:
+            st.error(f"❌ خطأ في جلب سجل الأسعار: {str(e)}")
+            return pd.DataFrame(columns=PRICE_HISTORY_COLUMNS)
+
+    def get_changes(self, since):
+        """ما تغير منذ since: منتجات جديدة، تغير السعر، نفد، أُخفي، حُذف (الأحدث أولاً)
+
+        إذا كانت نسخة المنتجات محملة في هذه العملية وسجلها يغطي الفترة، تُستخدم التغييرات المكتشفة
+        أثناء المزامنة. وإلا يُقرأ من قاعدة البيانات ما تحدث منذ since فقط (فهرس last_updated).
+        """
+        cache = get_product_cache(self.connection_string)
+        try:
+            if cache.frame is not None:
+                cache.get(self)
+                if cache.tracks_changes_since(since):
+                    return cache.changes_since(since)
+
+            return self.query_changes(since)
+
+        except Exception as e:
+            st.error(f"❌ خطأ في جلب التغييرات: {str(e)}")
+            return empty_changes()
+
+    @cache_by_data_version(ttl=60)
+    def query_changes(_self, since):
+        """الصفوف المتحدثة منذ since مصنفة حسب نوع التغيير (بدون نسخة سابقة في الذاكرة)"""
+        params = [since]
+        previous_price = "NULL AS previous_price"
+        history_join = ""
+
+        # السعر قبل بداية الفترة من سجل الأسعار (فهرس product_id, ts)
+        if has_price_history(_self):
+            previous_price = "h.price AS previous_price"
+            history_join = """
+                LEFT JOIN LATERAL (
+                    SELECT price FROM price_history
+                    WHERE product_id = p.product_id::text AND ts < %s
+                    ORDER BY ts DESC
+                    LIMIT 1
+                ) h ON TRUE
+            """
+            params = [since, since]
+
+        query = f"""
+            SELECT
+                p.id, p.product_id, p.name, p.current_price,
+                p.is_deleted, p.is_out_of_stock, p.is_hidden,
+                p.created_at, p.last_updated,
+                {previous_price}
+            FROM products p
+            {history_join}
+            WHERE p.last_updated >= %s
+            ORDER BY p.last_updated DESC
+            LIMIT %s
+        """
+
+        df = _self.read_sql(query, params + [CHANGES_MAX_ROWS])
+        df['status'] = derive_status(df)
+        return classify_changes(df, since)
+
+    def get_data_version(self):
+        """نسخة بيانات المنتجات الحالية (مفتاح كل الكاشات)؛ لا تُفحص أكثر من مرة كل DATA_VERSION_TTL ثانية
+
+        فشل الفحص يُحفظ أيضاً لنفس المدة، فلا ينتظر كل استدعاء مهلة الاتصال من جديد.
+        """
+        now = time.monotonic()
+        cached = _data_versions.get(self.connection_string)
+        if cached is not None and now - cached[1] < DATA_VERSION_TTL:
+            if isinstance(cached[0], Exception):
+                raise cached[0].with_traceback(None)
+            return cached[0]
+
+        try:
+            version = self.probe_data_version()
+        except Exception as e:
+            _data_versions[self.connection_string] = (e, now)
+            raise
+        _data_versions[self.connection_string] = (version, now)
+        return version
+
+    def probe_data_version(self):
+        """نسخة بيانات المنتجات من قاعدة البيانات مباشرة
+
+        مع migration 0004: رقم في صف واحد يزيده trigger مع كل تعديل على products.
+        بدونها: آخر last_updated + عدد الصفوف (لا يلتقط التعديلات التي لا تحدّث last_updated).
+        """
+        if has_data_version(self):
+            query = "SELECT 'v' || version FROM products_version"
+        else:
+            query = "SELECT concat(max(last_updated), '|', count(*)) FROM products"
+
+        def fetch(conn):
+            with conn.cursor() as cur:
+                cur.execute(query)
+                return cur.fetchone()[0]
+
+        with perf.timed('db.data_version'):
+            return self.pool.run(fetch)
+
+    def iter_product_batches(self, status=None, category=None, search=None,
+                             sort='last_checked', batch_size=None, ids=None):
+        """قراءة المنتجات المفلترة على دفعات (مع الأعمدة المشتقة) عبر stream_sql"""
+        fulltext = bool(search) and self.fulltext_search_enabled()
+        where, params = build_product_filters(status, category, search, ids, fulltext)
+        order, order_params = build_product_order(sort, search, fulltext)
+        query = f"""
+            SELECT {PRODUCT_COLUMNS}
+            FROM products
+            {where}
+            ORDER BY {order}
+        """
+        params += order_params
+
+        for batch in self.stream_sql(query, params, itersize=batch_size):
+            yield add_derived_columns(batch)
 
     def export_to_excel(self, df):
         """تصدير البيانات إلى Excel"""
         try:
             from io import BytesIO
 
-            # اختيار الأعمدة المهمة للتصدير
-            export_columns = [
-                'product_id', 'name', 'current_price', 'old_price',
-                'discount_percentage', 'category', 'status',
-                'url', 'last_updated'
-            ]
-
-            # التأكد من وجود الأعمدة
-            available_cols = [col for col in export_columns if col in df.columns]
-            export_df = df[available_cols].copy()
-
-            # تنسيق الأسماء بالعربي
-            column_names = {
-                'product_id': 'رقم المنتج',
-                'name': 'اسم المنتج',
-                'current_price': 'السعر الحالي',
-                'old_price': 'السعر القديم',
-                'discount_percentage': 'نسبة الخصم',
-                'category': 'القسم',
-                'status': 'الحالة',
-                'url': 'الرابط',
-                'last_updated': 'آخر تحديث'
-            }
-
-            export_df = export_df.rename(columns=column_names)
-
-            output = BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                export_df.to_excel(writer, index=False, sheet_name='Products')
-
+            with perf.timed('export.to_excel', rows=len(df)) as span:
+                output = BytesIO()
+                write_export([df], 'xlsx', output)
+                span.bytes = output.tell()
             return output.getvalue()
 
         except Exception as e:
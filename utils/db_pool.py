@@ -0,0 +1,168 @@
+"""
+utils/db_pool.py - Database Connection Pool
+مجمع اتصالات مشترك على مستوى العملية لقاعدة البيانات
+"""
+
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+
+# الأخطاء التي تعني أن الاتصال نفسه لم يعد صالحاً
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+class ConnectionPool:
+    """مجمع اتصالات آمن بين الخيوط مع فحص الاتصالات الخاملة وإعادة الاتصال"""
+
+    def __init__(self, dsn, minconn=1, maxconn=10, idle_check_after=30,
+                 acquire_timeout=30, connect_timeout=10):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.idle_check_after = idle_check_after
+        self.acquire_timeout = acquire_timeout
+        self.connect_timeout = connect_timeout
+
+        self._pool = None
+        self._lock = threading.Lock()
+        # ThreadedConnectionPool يرفع PoolError عند الامتلاء، لذلك ننتظر هنا بدلاً من ذلك
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}
+
+    def _get_pool(self):
+        """إنشاء المجمع عند أول استخدام"""
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = pg_pool.ThreadedConnectionPool(
+                        self.minconn, self.maxconn, self.dsn,
+                        connect_timeout=self.connect_timeout
+                    )
+        return self._pool
+
+    def _is_healthy(self, conn):
+        """فحص الاتصال قبل إعادة استخدامه"""
+        if conn.closed:
+            return False
+
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.idle_check_after:
+            return True
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except CONNECTION_ERRORS:
+            return False
+
+    def _discard(self, conn):
+        """إخراج اتصال تالف من المجمع"""
+        self._last_used.pop(id(conn), None)
+        try:
+            self._get_pool().putconn(conn, close=True)
+        except pg_pool.PoolError:
+            pass
+
+    def getconn(self):
+        """استعارة اتصال سليم من المجمع"""
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise pg_pool.PoolError("انتهت مهلة انتظار اتصال متاح بقاعدة البيانات")
+
+        try:
+            pool = self._get_pool()
+            # نجرب الاتصالات الخاملة حتى نجد اتصالاً سليماً، ثم نفتح اتصالاً جديداً
+            for _ in range(self.maxconn + 1):
+                conn = pool.getconn()
+                if self._is_healthy(conn):
+                    return conn
+                self._discard(conn)
+            raise psycopg2.OperationalError("تعذر الحصول على اتصال سليم بقاعدة البيانات")
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, close=False):
+        """إرجاع الاتصال إلى المجمع"""
+        try:
+            if close or conn.closed:
+                self._discard(conn)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                self._get_pool().putconn(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """اتصال مستعار: commit عند النجاح و rollback عند الخطأ"""
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except CONNECTION_ERRORS:
+            broken = True
+            raise
+        except BaseException:
+            # يشمل GeneratorExit: مستهلك stream_sql توقف قبل نهاية النتيجة
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn, close=broken or conn.closed)
+
+    def run(self, func, retries=1):
+        """تنفيذ func(conn) مع إعادة المحاولة على اتصال جديد إذا انقطع الاتصال"""
+        for attempt in range(retries + 1):
+            try:
+                with self.connection() as conn:
+                    return func(conn)
+            except CONNECTION_ERRORS:
+                if attempt >= retries:
+                    raise
+
+    def closeall(self):
+        """إغلاق جميع الاتصالات"""
+        with self._lock:
+            if self._pool is not None and not self._pool.closed:
+                self._pool.closeall()
+            self._pool = None
+            self._last_used.clear()
+
+
+# مجمع واحد لكل connection string على مستوى العملية
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(dsn, minconn=None, maxconn=None):
+    """الحصول على المجمع المشترك الخاص بالـ dsn"""
+    # None فقط يعني "غير محدد": القيمة 0 الصريحة لا تُستبدل بالافتراضية
+    if minconn is None:
+        minconn = int(os.getenv('DB_POOL_MIN', '1'))
+    if maxconn is None:
+        maxconn = int(os.getenv('DB_POOL_MAX', '10'))
+
+    with _pools_lock:
+        if dsn not in _pools:
+            _pools[dsn] = ConnectionPool(
+                dsn,
+                minconn=minconn,
+                maxconn=maxconn,
+                idle_check_after=int(os.getenv('DB_POOL_IDLE_CHECK', '30'))
+            )
+        return _pools[dsn]
+
+
+@atexit.register
+def _close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.closeall()
@@ -0,0 +1,182 @@
+"""
+utils/export.py - Streaming Data Export
+تصدير المنتجات على دفعات (Excel / CSV / Parquet) دون تحميل الملف كاملاً في الذاكرة
+"""
+
+import os
+import tempfile
+
+import pandas as pd
+
+from .perf import perf
+
+# الأعمدة المهمة للتصدير
+EXPORT_COLUMNS = [
+    'product_id', 'name', 'current_price', 'old_price',
+    'discount_percentage', 'category', 'status',
+    'url', 'last_updated'
+]
+
+# تنسيق الأسماء بالعربي
+COLUMN_NAMES = {
+    'product_id': 'رقم المنتج',
+    'name': 'اسم المنتج',
+    'current_price': 'السعر الحالي',
+    'old_price': 'السعر القديم',
+    'discount_percentage': 'نسبة الخصم',
+    'category': 'القسم',
+    'status': 'الحالة',
+    'url': 'الرابط',
+    'last_updated': 'آخر تحديث'
+}
+
+TEXT_COLUMNS = ['product_id', 'name', 'category', 'status', 'url']
+NUMERIC_COLUMNS = ['current_price', 'old_price', 'discount_percentage']
+
+# تقدير متحفظ لحجم الصف في الذاكرة (tuple من psycopg2 + DataFrame + صف الكاتب)
+ESTIMATED_ROW_BYTES = 2048
+EXPORT_MEMORY_LIMIT_MB = int(os.getenv('EXPORT_MEMORY_LIMIT_MB', '64'))
+
+
+def export_batch_size(memory_limit_mb=EXPORT_MEMORY_LIMIT_MB):
+    """عدد الصفوف في الدفعة الواحدة بحيث لا يتجاوز الحد الأعلى للذاكرة"""
+    rows = memory_limit_mb * 1024 * 1024 // ESTIMATED_ROW_BYTES
+    return max(500, min(rows, 50_000))
+
+
+def prepare_batch(df):
+    """اختيار أعمدة التصدير وتوحيد أنواعها حتى تتطابق كل الدفعات"""
+    batch = pd.DataFrame(index=df.index)
+
+    for column in EXPORT_COLUMNS:
+        values = df[column] if column in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if column in TEXT_COLUMNS:
+            batch[column] = values.astype(object).where(values.notna(), None).map(
+                lambda x: x if x is None else str(x)
+            )
+        elif column in NUMERIC_COLUMNS:
+            # الأسعار محفوظة كـ float32؛ التقريب يمنع ظهور 19.989999771 بدلاً من 19.99
+            batch[column] = pd.to_numeric(values, errors='coerce').astype('float64').round(2)
+        else:
+            # Excel لا يدعم المناطق الزمنية
+            batch[column] = pd.to_datetime(values, utc=True).dt.tz_localize(None)
+
+    return batch
+
+
+class ExcelExportWriter:
+    """كتابة xlsx بوضع write-only في openpyxl (الصفوف تُكتب إلى ملف مؤقت وليس الذاكرة)"""
+
+    extension = 'xlsx'
+    mime = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+    def __init__(self, path):
+        from openpyxl import Workbook
+
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet('Products')
+        self.sheet.append([COLUMN_NAMES[col] for col in EXPORT_COLUMNS])
+
+    def write(self, batch):
+        values = batch.astype(object).where(batch.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            self.sheet.append(row)
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class CsvExportWriter:
+    """كتابة CSV بترميز utf-8-sig حتى يفتحه Excel بالعربي بشكل صحيح"""
+
+    extension = 'csv'
+    mime = 'text/csv'
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self.header = True
+
+    def write(self, batch):
+        batch.rename(columns=COLUMN_NAMES).to_csv(self.file, index=False, header=self.header)
+        self.header = False
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetExportWriter:
+    """كتابة Parquet دفعة بدفعة (يتطلب pyarrow)"""
+
+    extension = 'parquet'
+    mime = 'application/vnd.apache.parquet'
+
+    def __init__(self, path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("تصدير Parquet يتطلب تثبيت مكتبة pyarrow")
+
+        self.pa = pa
+        self.path = path
+        self.schema = pa.schema([
+            (COLUMN_NAMES[col],
+             pa.string() if col in TEXT_COLUMNS else
+             pa.float64() if col in NUMERIC_COLUMNS else
+             pa.timestamp('us'))
+            for col in EXPORT_COLUMNS
+        ])
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, batch):
+        table = self.pa.Table.from_pandas(
+            batch.rename(columns=COLUMN_NAMES), schema=self.schema, preserve_index=False
+        )
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+
+EXPORT_FORMATS = {
+    'xlsx': ExcelExportWriter,
+    'csv': CsvExportWriter,
+    'parquet': ParquetExportWriter,
+}
+
+
+def write_export(batches, fmt, path, total_rows=None, progress=None):
+    """كتابة الدفعات إلى path، مع استدعاء progress(done, total) بعد كل دفعة"""
+    writer = EXPORT_FORMATS[fmt](path)
+    done = 0
+
+    try:
+        for batch in batches:
+            writer.write(prepare_batch(batch))
+            done += len(batch)
+            if progress:
+                progress(done, total_rows)
+    finally:
+        writer.close()
+
+    return done
+
+
+def export_products(db, fmt='xlsx', status=None, category=None, search=None,
+                    sort='last_checked', progress=None, path=None, ids=None):
+    """تصدير المنتجات المفلترة من قاعدة البيانات مباشرة إلى ملف على القرص"""
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix='janoubco_export_', suffix=f'.{fmt}')
+        os.close(fd)
+
+    with perf.timed(f'export.{fmt}') as span:
+        total_rows = db.count_products(status, category, search, ids)
+        batches = db.iter_product_batches(
+            status, category, search, sort, batch_size=export_batch_size(), ids=ids
+        )
+        write_export(batches, fmt, path, total_rows, progress)
+        span.rows = total_rows
+        span.bytes = os.path.getsize(path)
+    return path
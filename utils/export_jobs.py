@@ -0,0 +1,164 @@
+"""
+utils/export_jobs.py - Background Export Jobs
+تشغيل التصدير في الخلفية مع كاش للملفات الجاهزة على القرص
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .export import EXPORT_FORMATS, export_products
+
+
+class ExportJob:
+    """مهمة تصدير واحدة وحالتها"""
+
+    def __init__(self, key, fmt):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.fmt = fmt
+        self.status = 'queued'  # queued / running / done / failed
+        self.done = 0
+        self.total = None
+        self.path = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+
+class ExportJobManager:
+    """مجمع خيوط محدود للتصدير + كاش LRU للملفات على القرص"""
+
+    def __init__(self, cache_dir='data/exports', max_workers=2, max_cache_mb=512, job_ttl=3600):
+        self.cache_dir = cache_dir
+        self.max_cache_bytes = max_cache_mb * 1024 * 1024
+        self.job_ttl = job_ttl
+
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='export')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(fmt, filters, sort, data_version):
+        """مفتاح الملف: الفلاتر + الترتيب + الصيغة + نسخة البيانات"""
+        payload = json.dumps(
+            {'fmt': fmt, 'filters': filters, 'sort': sort, 'version': data_version},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def _cache_path(self, key, fmt):
+        return os.path.join(self.cache_dir, f"{key}.{EXPORT_FORMATS[fmt].extension}")
+
+    def submit(self, db, fmt, filters, sort='last_checked'):
+        """إضافة مهمة تصدير (أو إرجاع الملف الجاهز من الكاش مباشرة)"""
+        key = self.cache_key(fmt, filters, sort, db.get_data_version())
+        path = self._cache_path(key, fmt)
+
+        with self._lock:
+            self._prune_jobs()
+
+            # نفس التصدير قيد التنفيذ بالفعل
+            for job in self._jobs.values():
+                if job.key == key and not job.finished:
+                    return job
+
+            job = ExportJob(key, fmt)
+            self._jobs[job.id] = job
+
+            if os.path.exists(path):
+                # تحديث وقت التعديل ليبقى الملف في مقدمة LRU
+                os.utime(path)
+                job.path = path
+                job.finished_at = time.time()
+                job.status = 'done'
+                return job
+
+        self._executor.submit(self._run, job, db, filters, sort, path)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, db, filters, sort, path):
+        job.status = 'running'
+        tmp_path = f"{path}.{job.id}.tmp"
+
+        def update_progress(done, total):
+            job.done = done
+            job.total = total
+
+        try:
+            export_products(db, job.fmt, **filters, sort=sort, progress=update_progress, path=tmp_path)
+            os.replace(tmp_path, path)
+            self._evict(keep=path)
+            self._finish(job, path=path)
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self._finish(job, error=str(e))
+
+    def _finish(self, job, path=None, error=None):
+        """إنهاء المهمة: finished_at قبل الحالة وتحت القفل، فلا يرى _prune_jobs مهمة منتهية بلا وقت"""
+        with self._lock:
+            job.finished_at = time.time()
+            job.path = path
+            job.error = error
+            job.status = 'failed' if error is not None else 'done'
+
+    def _evict(self, keep=None):
+        """حذف أقدم الملفات حتى يعود حجم الكاش تحت الحد"""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            full = os.path.join(self.cache_dir, name)
+            if name.endswith('.tmp') or not os.path.isfile(full):
+                continue
+            stat = os.stat(full)
+            files.append((stat.st_mtime, stat.st_size, full))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, full in sorted(files):
+            if total <= self.max_cache_bytes:
+                break
+            if full == keep:
+                continue
+            try:
+                os.remove(full)
+                total -= size
+            except OSError:
+                pass
+
+    def _prune_jobs(self):
+        """نسيان المهام المنتهية القديمة"""
+        now = time.time()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished and now - job.finished_at > self.job_ttl]:
+            del self._jobs[job_id]
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_export_manager():
+    """مدير مهام التصدير المشترك على مستوى العملية"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ExportJobManager(
+                cache_dir=os.getenv('EXPORT_CACHE_DIR', 'data/exports'),
+                max_workers=int(os.getenv('EXPORT_WORKERS', '2')),
+                max_cache_mb=int(os.getenv('EXPORT_CACHE_MB', '512'))
+            )
+        return _manager
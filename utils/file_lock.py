@@ -0,0 +1,41 @@
+"""
+utils/file_lock.py - Inter-process File Lock
+قفل حصري بين العمليات على ملف مساعد (fcntl على Linux/macOS، msvcrt على Windows)
+"""
+
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def file_lock(lock_path, blocking=True):
+    """قفل حصري بين العمليات على ملف مساعد
+
+    مع blocking=False لا ننتظر: القيمة المرجعة False إذا كان القفل مع عملية أخرى.
+    """
+    with open(lock_path, 'a+b') as f:
+        try:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            if blocking:
+                raise
+            yield False
+            return
+
+        try:
+            yield True
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,209 @@
+"""
+utils/migrations.py - Database Migrations
+تغييرات مخطط قاعدة البيانات التي يحتاجها التطبيق (فهارس البحث...) مع تسجيل ما تم تطبيقه
+
+التشغيل اليدوي:
+    python -m utils.migrations
+"""
+
+import threading
+import time
+
+from .search import ARABIC_TRANSLATION
+
+
+def _normalize_function_sql():
+    """دالة search_normalize في PostgreSQL بنفس توحيد الحروف في utils/search.py"""
+    mapped = [(chr(src), dst) for src, dst in ARABIC_TRANSLATION.items() if dst is not None]
+    removed = [chr(src) for src, dst in ARABIC_TRANSLATION.items() if dst is None]
+
+    # translate(): الحروف الزائدة في from (بلا مقابل في to) تُحذف
+    from_chars = ''.join(src for src, _ in mapped) + ''.join(removed)
+    to_chars = ''.join(dst for _, dst in mapped)
+
+    return f"""
+        CREATE OR REPLACE FUNCTION search_normalize(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE
+        AS $$ SELECT lower(translate($1, '{from_chars}', '{to_chars}')) $$
+    """
+
+
+# الترتيب مهم؛ الاسم يُسجّل في schema_migrations بعد نجاح كل الجمل
+MIGRATIONS = [
+    ('0001_product_search', [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        _normalize_function_sql(),
+        # البحث الجزئي (ILIKE) والتقريبي (word_similarity) على الاسم الموحد
+        """
+        CREATE INDEX IF NOT EXISTS products_name_trgm_idx
+        ON products USING gin (search_normalize(name) gin_trgm_ops)
+        """,
+        # البحث بالكلمات الكاملة
+        """
+        CREATE INDEX IF NOT EXISTS products_name_tsv_idx
+        ON products USING gin (to_tsvector('simple', search_normalize(name)))
+        """,
+    ]),
+    ('0002_price_history', [
+        # سطر لكل تغيير في السعر؛ product_id نصي حتى لا يعتمد على نوع العمود في products
+        """
+        CREATE TABLE IF NOT EXISTS price_history (
+            product_id TEXT NOT NULL,
+            ts TIMESTAMPTZ NOT NULL DEFAULT now(),
+            price NUMERIC,
+            old_price NUMERIC
+        )
+        """,
+        # كل استعلامات السجل تكون لمنتجات محددة خلال فترة زمنية
+        """
+        CREATE INDEX IF NOT EXISTS price_history_product_ts_idx
+        ON price_history (product_id, ts)
+        """,
+        """
+        CREATE OR REPLACE FUNCTION record_price_change() RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' OR NEW.current_price IS DISTINCT FROM OLD.current_price THEN
+                INSERT INTO price_history (product_id, ts, price, old_price)
+                VALUES (NEW.product_id::text, now(), NEW.current_price, NEW.old_price);
+            END IF;
+            RETURN NEW;
+        END
+        $$
+        """,
+        "DROP TRIGGER IF EXISTS products_price_history ON products",
+        """
+        CREATE TRIGGER products_price_history
+        AFTER INSERT OR UPDATE OF current_price ON products
+        FOR EACH ROW EXECUTE FUNCTION record_price_change()
+        """,
+        # نقطة البداية: السعر الحالي لكل منتج
+        """
+        INSERT INTO price_history (product_id, ts, price, old_price)
+        SELECT product_id::text, COALESCE(last_updated, now()), current_price, old_price
+        FROM products
+        WHERE product_id IS NOT NULL
+        """,
+    ]),
+    ('0003_products_last_updated', [
+        # المزامنة التزايدية وموجز التغييرات يقرآن الصفوف المتغيرة منذ وقت محدد فقط
+        """
+        CREATE INDEX IF NOT EXISTS products_last_updated_idx
+        ON products (last_updated)
+        """,
+    ]),
+    ('0004_data_version', [
+        # صف واحد يزيد رقمه مع كل تعديل على products؛ قراءته أرخص بكثير من max/count على الجدول
+        """
+        CREATE TABLE IF NOT EXISTS products_version (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            version BIGINT NOT NULL DEFAULT 0,
+            changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """,
+        "INSERT INTO products_version (id) VALUES (TRUE) ON CONFLICT DO NOTHING",
+        """
+        CREATE OR REPLACE FUNCTION bump_products_version() RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+            UPDATE products_version SET version = version + 1, changed_at = now();
+            RETURN NULL;
+        END
+        $$
+        """,
+        "DROP TRIGGER IF EXISTS products_version_bump ON products",
+        # مرة لكل جملة وليس لكل صف: تحديث آلاف الصفوف يزيد النسخة مرة واحدة
+        """
+        CREATE TRIGGER products_version_bump
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON products
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_products_version()
+        """,
+    ]),
+]
+
+
+def applied_migrations(db):
+    """أسماء الـ migrations المطبقة"""
+    def fetch(conn):
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+            if not cur.fetchone()[0]:
+                return set()
+            cur.execute("SELECT name FROM schema_migrations")
+            return {row[0] for row in cur.fetchall()}
+
+    return db.pool.run(fetch)
+
+
+def apply_migrations(db):
+    """تطبيق الـ migrations الناقصة بالترتيب، كل واحدة في transaction مستقلة"""
+    applied = applied_migrations(db)
+    newly_applied = []
+
+    for name, statements in MIGRATIONS:
+        if name in applied:
+            continue
+
+        with db.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        name TEXT PRIMARY KEY,
+                        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                    )
+                """)
+                for statement in statements:
+                    cur.execute(statement)
+                cur.execute("INSERT INTO schema_migrations (name) VALUES (%s)", [name])
+
+        newly_applied.append(name)
+
+    with _applied_cache_lock:
+        _applied_cache.pop(db.connection_string, None)
+    return newly_applied
+
+
+# الـ migrations المطبقة تُفحص مرة كل فترة لكل قاعدة بيانات (للميزات التي تعتمد عليها)
+SCHEMA_CHECK_INTERVAL = 300
+_applied_cache = {}
+_applied_cache_lock = threading.Lock()
+
+
+def schema_applied(db, name):
+    """هل الـ migration المحددة مطبقة؟ (نتيجة مخزنة لمدة SCHEMA_CHECK_INTERVAL)"""
+    key = db.connection_string
+    now = time.monotonic()
+
+    with _applied_cache_lock:
+        cached = _applied_cache.get(key)
+
+    if cached is None or now - cached[0] >= SCHEMA_CHECK_INTERVAL:
+        cached = (now, applied_migrations(db))
+        with _applied_cache_lock:
+            _applied_cache[key] = cached
+
+    return name in cached[1]
+
+
+def has_search_schema(db):
+    """هل فهارس البحث (pg_trgm / tsvector) مطبقة؟"""
+    return schema_applied(db, '0001_product_search')
+
+
+def has_price_history(db):
+    """هل جدول سجل الأسعار والـ trigger الخاص به مطبقان؟"""
+    return schema_applied(db, '0002_price_history')
+
+
+def has_data_version(db):
+    """هل جدول نسخة البيانات والـ trigger الخاص به مطبقان؟"""
+    return schema_applied(db, '0004_data_version')
+
+
+if __name__ == '__main__':
+    from .database import Database
+
+    applied = apply_migrations(Database())
+    print(f"✅ تم تطبيق: {', '.join(applied)}" if applied else "✅ قاعدة البيانات محدثة")
@@ -0,0 +1,221 @@
+"""
+utils/perf.py - Performance Instrumentation
+قياس زمن المسارات الساخنة (هيستوغرام لكل مرحلة + عدد الصفوف والبايتات) وتصديرها
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# حدود الهيستوغرام بالثواني (نفس أسلوب Prometheus: كل حد يشمل ما قبله)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+PERF_ENABLED = os.getenv('PERF_ENABLED', '1') == '1'
+
+# التصدير الاختياري: ملف .prom (نص Prometheus يُستبدل) أو .json / .jsonl (سطر JSON يُضاف)
+PERF_EXPORT_PATH = os.getenv('PERF_EXPORT_PATH')
+PERF_EXPORT_INTERVAL = int(os.getenv('PERF_EXPORT_INTERVAL', '60'))
+
+
+class StageStats:
+    """إحصائيات مرحلة واحدة"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.errors = 0
+        self.rows = 0
+        self.bytes = 0
+        self.buckets = [0] * len(BUCKETS)
+
+    def add(self, seconds, rows=None, nbytes=None, error=False):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+        self.errors += int(error)
+        self.rows += rows or 0
+        self.bytes += nbytes or 0
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+    def quantile(self, q):
+        """تقدير النسبة المئوية من الهيستوغرام (الحد الأعلى للخانة التي تقع فيها)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        for bound, cumulative in zip(BUCKETS, self.buckets):
+            if cumulative >= target:
+                return bound
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_seconds': self.total,
+            'mean_seconds': self.total / self.count if self.count else 0.0,
+            'p50_seconds': self.quantile(0.5),
+            'p95_seconds': self.quantile(0.95),
+            'max_seconds': self.max,
+            'last_seconds': self.last,
+            'errors': self.errors,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'buckets': dict(zip([str(b) for b in BUCKETS], self.buckets)),
+        }
+
+
+class Span:
+    """قياس جارٍ؛ يمكن للكود المقاس تعبئة rows و bytes قبل انتهائه"""
+
+    __slots__ = ('rows', 'bytes')
+
+    def __init__(self, rows=None, nbytes=None):
+        self.rows = rows
+        self.bytes = nbytes
+
+
+class PerfRecorder:
+    """سجل القياسات على مستوى العملية (آمن بين الخيوط)"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._exported_at = 0.0
+
+    def record(self, stage, seconds, rows=None, nbytes=None, error=False):
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = StageStats()
+            stats.add(seconds, rows, nbytes, error)
+
+    @contextmanager
+    def timed(self, stage, rows=None, nbytes=None):
+        """with perf.timed('stage') as span: ... span.rows = len(df)"""
+        span = Span(rows, nbytes)
+        start = time.perf_counter()
+        error = False
+        try:
+            yield span
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(stage, time.perf_counter() - start, span.rows, span.bytes, error)
+
+    def instrument(self, stage, rows=None, nbytes=None):
+        """decorator؛ rows و nbytes دوال اختيارية تُطبق على القيمة المرجعة"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timed(stage) as span:
+                    result = func(*args, **kwargs)
+                    if rows is not None:
+                        span.rows = rows(result)
+                    if nbytes is not None:
+                        span.bytes = nbytes(result)
+                    return result
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        """نسخة من إحصائيات كل المراحل {stage: dict}"""
+        with self._lock:
+            return {stage: stats.to_dict() for stage, stats in sorted(self._stages.items())}
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self.started_at = time.time()
+
+    def to_json(self):
+        return json.dumps({
+            'timestamp': time.time(),
+            'pid': os.getpid(),
+            'started_at': self.started_at,
+            'stages': self.snapshot(),
+        }, ensure_ascii=False)
+
+    def to_prometheus(self):
+        """صيغة نص Prometheus (مناسبة لـ node_exporter textfile collector)"""
+        lines = [
+            '# HELP app_stage_seconds Stage latency in seconds.',
+            '# TYPE app_stage_seconds histogram',
+        ]
+        with self._lock:
+            stages = sorted(self._stages.items())
+
+            for stage, stats in stages:
+                label = stage.replace('\\', '\\\\').replace('"', '\\"')
+                for bound, cumulative in zip(BUCKETS, stats.buckets):
+                    lines.append(f'app_stage_seconds_bucket{{stage="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'app_stage_seconds_bucket{{stage="{label}",le="+Inf"}} {stats.count}')
+                lines.append(f'app_stage_seconds_sum{{stage="{label}"}} {stats.total:.6f}')
+                lines.append(f'app_stage_seconds_count{{stage="{label}"}} {stats.count}')
+
+            for metric, attribute, help_text in (
+                ('app_stage_rows_total', 'rows', 'Rows processed per stage.'),
+                ('app_stage_bytes_total', 'bytes', 'Bytes produced per stage.'),
+                ('app_stage_errors_total', 'errors', 'Failed calls per stage.'),
+            ):
+                lines.append(f'# HELP {metric} {help_text}')
+                lines.append(f'# TYPE {metric} counter')
+                for stage, stats in stages:
+                    label = stage.replace('\\', '\\\\').replace('"', '\\"')
+                    lines.append(f'{metric}{{stage="{label}"}} {getattr(stats, attribute)}')
+
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path):
+        """كتابة القياسات إلى ملف: .prom يُستبدل بشكل ذري، وغيره يُضاف كسطر JSON"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if path.endswith('.prom'):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, path)
+        else:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(self.to_json() + '\n')
+
+    def maybe_export(self):
+        """التصدير إلى PERF_EXPORT_PATH مرة كل PERF_EXPORT_INTERVAL ثانية على الأكثر"""
+        if not self.enabled or not PERF_EXPORT_PATH:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            if now - self._exported_at < PERF_EXPORT_INTERVAL:
+                return
+            self._exported_at = now
+
+        try:
+            self.export(PERF_EXPORT_PATH)
+        except OSError:
+            pass
+
+
+perf = PerfRecorder(enabled=PERF_ENABLED)
+
+
+def frame_rows(df):
+    return len(df) if df is not None else 0
+
+
+def frame_bytes(df):
+    """حجم الإطار في الذاكرة (بدون deep حتى يبقى القياس رخيصاً)"""
+    return int(df.memory_usage(index=True).sum()) if df is not None else 0
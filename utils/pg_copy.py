@@ -0,0 +1,171 @@
+"""
+utils/pg_copy.py - Bulk Reads
+قراءة النتائج الكبيرة من PostgreSQL: COPY (...) TO STDOUT مع قارئ CSV متجه،
+وتحويل دفعات cursor الخادم إلى DataFrame بأنواع ثابتة
+"""
+
+import io
+
+import pandas as pd
+from psycopg2 import extensions
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # pyarrow اختياري: بدونه يُستخدم قارئ CSV في pandas
+    pa = None
+
+# أنواع PostgreSQL (OID) ← نوع العمود في pandas
+BOOL_TYPES = {16}
+INT_TYPES = {20, 21, 23}
+FLOAT_TYPES = {700, 701, 1700}  # float4, float8, numeric
+TIMESTAMP_TYPES = {1114}  # timestamp
+TIMESTAMPTZ_TYPES = {1184}  # timestamptz
+DATE_TYPES = {1082}
+
+# علامة NULL صريحة في CSV حتى لا يلتبس NULL بالنص الفارغ '' (الافتراضي في COPY حقل فارغ)
+COPY_NULL = '\\N'
+
+
+def query_columns(cur, query, params=None):
+    """أسماء وأنواع أعمدة الاستعلام دون جلب أي صف"""
+    cur.execute(f"SELECT * FROM ({query}) AS q LIMIT 0", params or None)
+    return [(column.name, column.type_code) for column in cur.description]
+
+
+def copy_to_buffer(cur, query, params=None):
+    """نتيجة الاستعلام كـ CSV في الذاكرة (التواريخ بتوقيت UTC)"""
+    sql = cur.mogrify(query, params or None).decode()
+    # SET LOCAL يقتصر على هذه المعاملة، فلا يؤثر على الاتصال بعد إرجاعه للمجمع
+    cur.execute("SET LOCAL TimeZone = 'UTC'")
+
+    buffer = io.BytesIO()
+    cur.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER true, NULL '{COPY_NULL}')", buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def _arrow_type(type_code):
+    if type_code in BOOL_TYPES:
+        return pa.bool_()
+    if type_code in INT_TYPES:
+        return pa.int64()
+    if type_code in FLOAT_TYPES:
+        return pa.float64()
+    if type_code in TIMESTAMPTZ_TYPES:
+        return pa.timestamp('us', tz='UTC')
+    if type_code in TIMESTAMP_TYPES or type_code in DATE_TYPES:
+        return pa.timestamp('us')
+    return pa.string()
+
+
+def _parse_with_arrow(buffer, columns):
+    """قارئ CSV في pyarrow (متعدد الخيوط، ويحلل التواريخ والأعلام مباشرة)"""
+    convert_options = pacsv.ConvertOptions(
+        column_types={name: _arrow_type(type_code) for name, type_code in columns},
+        true_values=['t'],
+        false_values=['f'],
+        null_values=[COPY_NULL],
+        strings_can_be_null=True,
+        # COPY يضع النص "\N" بين علامتي تنصيص ليميزه عن NULL
+        quoted_strings_can_be_null=False,
+    )
+    # COPY يضع القيم التي فيها سطر جديد (الأسماء، الروابط) بين علامتي تنصيص؛ بدون هذا الخيار
+    # يقسم pyarrow الملف إلى كتل عند أي سطر جديد، فتنكسر القيمة الواقعة على حدود كتلتين
+    parse_options = pacsv.ParseOptions(newlines_in_values=True)
+    table = pacsv.read_csv(
+        pa.py_buffer(buffer.getbuffer()), parse_options=parse_options, convert_options=convert_options
+    )
+    return table.to_pandas()
+
+
+def _parse_with_pandas(buffer, columns):
+    """قارئ CSV في pandas (C engine) عند عدم توفر pyarrow"""
+    dtypes = {}
+    for name, type_code in columns:
+        if type_code in BOOL_TYPES:
+            dtypes[name] = 'boolean'
+        elif type_code in INT_TYPES:
+            dtypes[name] = 'Int64'
+        elif type_code in FLOAT_TYPES:
+            dtypes[name] = 'float64'
+        else:
+            dtypes[name] = object
+
+    df = pd.read_csv(
+        buffer,
+        dtype=dtypes,
+        true_values=['t'],
+        false_values=['f'],
+        keep_default_na=False,
+        na_values=[COPY_NULL],
+    )
+
+    for name, type_code in columns:
+        if type_code in INT_TYPES and not df[name].hasnans:
+            df[name] = df[name].astype('int64')
+        elif type_code in TIMESTAMPTZ_TYPES:
+            df[name] = pd.to_datetime(df[name], format='ISO8601', utc=True)
+        elif type_code in TIMESTAMP_TYPES or type_code in DATE_TYPES:
+            df[name] = pd.to_datetime(df[name], format='ISO8601')
+
+    return df
+
+
+def parse_copy_csv(buffer, columns):
+    """تحليل CSV الناتج من COPY بأنواع الأعمدة الصحيحة
+
+    النص الفارغ '' يبقى نصاً وNULL يصبح قيمة مفقودة كما في pd.read_sql. قارئ pandas لا يميز
+    القيم المقتبسة، فالنص "\\N" نفسه يصبح قيمة مفقودة عند عدم توفر pyarrow.
+    """
+    if pa is not None:
+        return _parse_with_arrow(buffer, columns)
+    return _parse_with_pandas(buffer, columns)
+
+
+def register_fast_types(cur):
+    """أنواع أسرع لصفوف هذا الـ cursor فقط: numeric كـ float بدل Decimal،
+    والتواريخ كنص يحلله pandas دفعة واحدة بدل بناء كائن datetime لكل قيمة
+    """
+    extensions.register_type(extensions.new_type(
+        tuple(FLOAT_TYPES), 'FLOAT_FAST', lambda value, cur: None if value is None else float(value)
+    ), cur)
+    extensions.register_type(extensions.new_type(
+        tuple(TIMESTAMPTZ_TYPES | TIMESTAMP_TYPES | DATE_TYPES), 'TIMESTAMP_TEXT', lambda value, cur: value
+    ), cur)
+
+
+def frame_from_rows(rows, columns):
+    """DataFrame من صفوف cursor بأنواع تحددها أعمدة الاستعلام وليس القيم
+
+    كل الدفعات من نفس الاستعلام لها نفس الأنواع، حتى الدفعة التي كل قيم عمود فيها NULL.
+    """
+    df = pd.DataFrame.from_records(rows, columns=[name for name, _ in columns])
+
+    for name, type_code in columns:
+        if type_code in BOOL_TYPES:
+            df[name] = df[name].astype('boolean')
+        elif type_code in INT_TYPES:
+            values = df[name].astype('Int64')
+            df[name] = values if values.hasnans else values.astype('int64')
+        elif type_code in FLOAT_TYPES:
+            # numeric تصل كـ Decimal ما لم يُستخدم register_fast_types
+            df[name] = pd.to_numeric(df[name], errors='coerce').astype('float64')
+        elif type_code in TIMESTAMPTZ_TYPES:
+            df[name] = pd.to_datetime(df[name], format='ISO8601', utc=True).astype('datetime64[us, UTC]')
+        elif type_code in TIMESTAMP_TYPES or type_code in DATE_TYPES:
+            df[name] = pd.to_datetime(df[name], format='ISO8601').astype('datetime64[us]')
+        else:
+            # النص object دائماً (pandas يستنتج str فقط إذا وُجدت قيمة غير NULL في الدفعة)
+            df[name] = df[name].astype(object)
+
+    return df
+
+
+def copy_query(conn, query, params=None):
+    """DataFrame لنتيجة الاستعلام عبر COPY (بديل أسرع لـ pd.read_sql مع النتائج الكبيرة)"""
+    with conn.cursor() as cur:
+        columns = query_columns(cur, query, params)
+        buffer = copy_to_buffer(cur, query, params)
+    nbytes = buffer.getbuffer().nbytes
+    return parse_copy_csv(buffer, columns), nbytes
@@ -0,0 +1,268 @@
+"""
+utils/product_cache.py - Incremental Products Cache
+نسخة المنتجات في الذاكرة مع مزامنة تزايدية على last_updated
+"""
+
+import os
+import threading
+import time
+
+import pandas as pd
+
+from .changes import CHANGES_RETENTION_HOURS, align_timestamp, diff_products, empty_changes
+from .file_lock import file_lock
+from .product_frame import compact_dtypes
+from .search import ProductSearchIndex
+from .snapshot import snapshot_for
+
+
+class ProductCache:
+    """آخر نسخة من جدول المنتجات + علامة أعلى last_updated تمت مزامنته
+
+    النسخة صالحة ما دامت نسخة البيانات (Database.get_data_version) لم تتغير.
+    """
+
+    def __init__(self, full_refresh_interval=21600, snapshot=None, streamed_full_load=True):
+        # المزامنة الكاملة الدورية تلتقط الصفوف المحذوفة فعلياً أو التي بلا last_updated
+        self.full_refresh_interval = full_refresh_interval
+
+        # نسخة مشتركة على القرص: عملية واحدة على الجهاز تزامن، والبقية تقرأ الملف
+        self.snapshot = snapshot
+        self.snapshot_file = None
+        # المزامنة الكاملة من cursor الخادم إلى الملف مباشرة: ذاكرة أقل بكثير، لكنها أبطأ من COPY
+        self.streamed_full_load = streamed_full_load
+
+        self.frame = None
+        self.high_water_mark = None
+        # نسخة البيانات التي يمثلها الإطار الحالي
+        self.version = None
+        self.full_refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+        # فهرس البحث يُبنى عند أول بحث بعد كل تحديث للنسخة
+        self._index = None
+        self._index_frame = None
+        self._index_lock = threading.Lock()
+
+        # سجل التغييرات المكتشفة أثناء المزامنة، وبداية الفترة التي يغطيها بالكامل
+        self.changes = empty_changes()
+        self.changes_tracked_since = None
+
+    def is_fresh(self, version):
+        return self.frame is not None and self.version == version
+
+    def get(self, db):
+        """إرجاع النسخة الحالية بعد مزامنتها إذا تغيرت نسخة البيانات"""
+        # النسخة المقروءة قبل المزامنة: ما يتغير أثناءها يظهر كنسخة جديدة في المرة القادمة
+        version = db.get_data_version()
+        if self.is_fresh(version):
+            return self.frame
+
+        with self._lock:
+            # ربما قام خيط آخر بالمزامنة أثناء انتظارنا
+            if self.is_fresh(version):
+                return self.frame
+
+            if self.snapshot is not None:
+                self._shared_sync(db, version)
+            else:
+                now = time.monotonic()
+                if self.frame is None or now - self.full_refreshed_at >= self.full_refresh_interval:
+                    self._full_load(db)
+                    self.full_refreshed_at = now
+                else:
+                    self._delta_sync(db)
+                self.version = version
+
+            return self.frame
+
+    def _snapshot_is_fresh(self, manifest, version):
+        return manifest is not None and manifest['version'] == version
+
+    def _shared_sync(self, db, version):
+        """المزامنة عبر النسخة المشتركة؛ قفل الملف يضمن أن عملية واحدة فقط تقرأ من قاعدة البيانات"""
+        manifest = self.snapshot.manifest()
+        if self._snapshot_is_fresh(manifest, version):
+            try:
+                self._adopt_snapshot(manifest)
+                return
+            except FileNotFoundError:
+                # بدون القفل: عملية أخرى نشرت ملفاً أحدث وحذفت هذا قبل ربطه؛ نعيد المحاولة تحت القفل
+                pass
+
+        # من لديه نسخة لا ينتظر: يستمر بها بينما تحدّث عملية أخرى الملف
+        with file_lock(self.snapshot.lock_path, blocking=self.frame is None) as acquired:
+            if not acquired:
+                return
+
+            manifest = self.snapshot.manifest()
+            if manifest is not None:
+                # المزامنة التزايدية تبدأ من أحدث نسخة كتبتها أي عملية
+                self._adopt_snapshot(manifest)
+                if self._snapshot_is_fresh(manifest, version):
+                    return
+
+            full_refreshed_at = manifest['full_refreshed_at'] if manifest else 0.0
+            full = self.frame is None or time.time() - full_refreshed_at >= self.full_refresh_interval
+            if full and self.streamed_full_load:
+                manifest = self._streamed_full_load(db, version)
+            else:
+                if full:
+                    self._full_load(db)
+                    full_refreshed_at = time.time()
+                    changed = True
+                else:
+                    changed = self._delta_sync(db)
+
+                if changed:
+                    manifest = self.snapshot.write(self.frame, version, full_refreshed_at)
+                    # استبدال النسخة الخاصة بالملف المربوط بالذاكرة حتى لا تبقى نسختان
+                    self.frame = self.snapshot.read(manifest)
+                else:
+                    # لم يتغير أي صف: نفس الملف بالنسخة الجديدة، دون إعادة كتابته أو ربطه
+                    manifest = self.snapshot.publish(manifest['file'], manifest['rows'], version, full_refreshed_at)
+            self.snapshot_file = manifest['file']
+            self.version = version
+
+    def _streamed_full_load(self, db, version):
+        """المزامنة الكاملة من قاعدة البيانات إلى ملف النسخة مباشرة على دفعات ثم ربطه بالذاكرة
+
+        الجدول الكامل لا يكون في الذاكرة الخاصة للعملية في أي لحظة، فقط دفعة واحدة.
+        """
+        previous, previous_mark = self.frame, self.high_water_mark
+        name, rows = self.snapshot.write_file(db.iter_product_batches())
+        self._replace(self.snapshot.map_file(name))
+        self._track_changes(previous, previous_mark)
+        return self.snapshot.publish(name, rows, version, time.time())
+
+    def _adopt_snapshot(self, manifest):
+        """الانتقال إلى النسخة التي كتبتها عملية أخرى (مع تسجيل ما تغير)"""
+        if manifest['file'] == self.snapshot_file:
+            return
+
+        previous, previous_mark = self.frame, self.high_water_mark
+        self._replace(self.snapshot.read(manifest))
+        self._track_changes(previous, previous_mark)
+        self.snapshot_file = manifest['file']
+        self.version = manifest['version']
+
+    def get_with_index(self, db):
+        """النسخة الحالية مع فهرس البحث المبني منها (نفس الإطار دائماً)"""
+        frame = self.get(db)
+
+        with self._index_lock:
+            if self._index_frame is not frame:
+                self._index = ProductSearchIndex(frame['name'].tolist() if not frame.empty else [])
+                self._index_frame = frame
+            return frame, self._index
+
+    def tracks_changes_since(self, since):
+        """هل سجل التغييرات في الذاكرة يغطي كل ما تغير منذ since؟"""
+        if self.changes_tracked_since is None:
+            return False
+        since = pd.Timestamp(since)
+        tracked = pd.Timestamp(self.changes_tracked_since)
+        if (since.tzinfo is None) != (tracked.tzinfo is None):
+            since = align_timestamp(since, pd.Series([tracked]))
+        return since >= tracked
+
+    def changes_since(self, since):
+        """التغييرات المسجلة منذ since (الأحدث أولاً)"""
+        changes = self.changes
+        if changes.empty:
+            return changes
+        return changes[changes['changed_at'] >= align_timestamp(since, changes['changed_at'])]
+
+    def _full_load(self, db):
+        previous, previous_mark = self.frame, self.high_water_mark
+        self._replace(db.fetch_products())
+        self._track_changes(previous, previous_mark)
+
+    def _track_changes(self, previous, previous_mark):
+        """تسجيل التغييرات بين النسخة السابقة والحالية (الصفوف المتحدثة بعد previous_mark فقط)"""
+        if previous is None or previous_mark is None:
+            # لا توجد نسخة سابقة للمقارنة: السجل يبدأ من الآن
+            self.changes = empty_changes()
+            self.changes_tracked_since = self.high_water_mark
+            return
+
+        # نقارن فقط الصفوف التي تحدثت بعد آخر مزامنة
+        changed = self.frame[self.frame['last_updated'] >= align_timestamp(previous_mark, self.frame['last_updated'])]
+        self._record_changes(previous[previous['id'].isin(changed['id'])], changed)
+
+    def _delta_sync(self, db):
+        """جلب الصفوف المتغيرة فقط ودمجها حسب id؛ يعيد False إذا لم يتغير الإطار"""
+        if self.high_water_mark is None:
+            self._full_load(db)
+            return True
+
+        # >= وليس > حتى لا نفقد صفوفاً بنفس الطابع الزمني كُتبت بعد آخر قراءة؛ الدمج حسب id يمنع التكرار
+        delta = db.fetch_products(since=self.high_water_mark)
+        if delta.empty or self._already_merged(delta):
+            return False
+
+        # الصفوف المتغيرة هي الأحدث، فوضعها في البداية يحافظ على الترتيب دون إعادة فرز الجدول
+        is_changed = self.frame['id'].isin(delta['id'])
+        self._record_changes(self.frame[is_changed], delta)
+
+        # الدمج يعيد أعمدة category بقواميس مختلفة إلى object، فنعيد ضغطها
+        merged = pd.concat([delta, self.frame[~is_changed]], ignore_index=True)
+        self._replace(compact_dtypes(merged))
+        return True
+
+    def _already_merged(self, delta):
+        """delta يعيد دائماً صفوف high_water_mark نفسه (>=)؛ إذا كانت مطابقة لما في الإطار فلا جديد"""
+        if (delta['last_updated'] > align_timestamp(self.high_water_mark, delta['last_updated'])).any():
+            return False
+
+        current = self.frame[self.frame['id'].isin(delta['id'])]
+        if len(current) != len(delta):
+            return False
+
+        # مقارنة القيم وليس الأنواع (النسخة المربوطة بالذاكرة نصوصها Arrow وقواميسها كاملة)
+        current = current.set_index('id').loc[delta['id'], delta.columns.drop('id')]
+        delta = delta.set_index('id')
+        return _values(current).equals(_values(delta))
+
+    def _record_changes(self, previous, current):
+        """إضافة أحداث التغيير إلى السجل وحذف ما تجاوز مدة الاحتفاظ"""
+        events = diff_products(previous, current)
+        if events.empty:
+            return
+
+        changes = pd.concat([events, self.changes], ignore_index=True) if not self.changes.empty else events
+        cutoff = changes['changed_at'].max() - pd.Timedelta(hours=CHANGES_RETENTION_HOURS)
+        self.changes = changes[changes['changed_at'] >= cutoff].reset_index(drop=True)
+        # ما قبل حد الاحتفاظ لم يعد مغطى بالسجل
+        if self.changes_tracked_since is None or pd.Timestamp(self.changes_tracked_since) < cutoff:
+            self.changes_tracked_since = cutoff.to_pydatetime()
+
+    def _replace(self, frame):
+        self.frame = frame
+        if not frame.empty and frame['last_updated'].notna().any():
+            self.high_water_mark = frame['last_updated'].max().to_pydatetime()
+        else:
+            self.high_water_mark = None
+
+
+def _values(frame):
+    """القيم كـ object مع None لكل القيم المفقودة"""
+    values = frame.astype(object)
+    return values.where(frame.notna(), None)
+
+
+# نسخة واحدة لكل قاعدة بيانات على مستوى العملية
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_product_cache(dsn):
+    """الحصول على كاش المنتجات المشترك الخاص بالـ dsn"""
+    with _caches_lock:
+        if dsn not in _caches:
+            _caches[dsn] = ProductCache(
+                full_refresh_interval=int(os.getenv('PRODUCTS_FULL_REFRESH_INTERVAL', '21600')),
+                snapshot=snapshot_for(dsn),
+                streamed_full_load=os.getenv('PRODUCTS_STREAMED_FULL_LOAD', '1') == '1'
+            )
+        return _caches[dsn]
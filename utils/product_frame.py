@@ -0,0 +1,43 @@
+"""
+utils/product_frame.py - Compact Products Frame
+أنواع أعمدة مضغوطة لجدول المنتجات في الذاكرة وتقرير استهلاكه للذاكرة
+"""
+
+import pandas as pd
+
+FLAG_COLUMNS = ['is_deleted', 'is_out_of_stock', 'is_hidden']
+PRICE_COLUMNS = ['current_price', 'old_price', 'discount_percentage']
+
+# تكرار القيم فيها كبير، فالـ category تخزنها كأرقام صغيرة + قاموس واحد
+CATEGORY_COLUMNS = ['category']
+
+
+def compact_dtypes(df):
+    """تحويل الأعمدة إلى أنواع مضغوطة (في مكانها)
+
+    الأعلام: boolean (تقبل NULL)، الأسعار: float32، القسم: category.
+    """
+    for column in FLAG_COLUMNS:
+        if column in df.columns and df[column].dtype != 'boolean':
+            df[column] = df[column].astype('boolean')
+
+    for column in PRICE_COLUMNS:
+        if column in df.columns and df[column].dtype != 'float32':
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('float32')
+
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+
+    return df
+
+
+def memory_report(df):
+    """استهلاك كل عمود للذاكرة (deep) مرتباً من الأكبر"""
+    usage = df.memory_usage(index=True, deep=True)
+    report = pd.DataFrame({
+        'column': usage.index,
+        'dtype': [str(df[column].dtype) if column in df.columns else '' for column in usage.index],
+        'bytes': usage.to_numpy(),
+    })
+    return report.sort_values('bytes', ascending=False, ignore_index=True)
@@ -0,0 +1,149 @@
+"""
+utils/search.py - Arabic Product Search Index
+فهرس بحث في الذاكرة لأسماء المنتجات: توحيد الحروف العربية + فهرس مقلوب + n-grams للبحث الجزئي والتقريبي
+"""
+
+import re
+from bisect import bisect_left
+
+import numpy as np
+
+# التشكيل والتطويل تُحذف، وأشكال الحروف المتقاربة توحّد
+ARABIC_TRANSLATION = str.maketrans({
+    **{chr(c): None for c in range(0x064B, 0x0653)},  # الفتحة ... السكون والمدة
+    '\u0670': None,  # الألف الخنجرية
+    '\u0640': None,  # التطويل
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي',
+    'ؤ': 'و',
+    'ة': 'ه',
+    **{chr(0x0660 + d): str(d) for d in range(10)},  # الأرقام العربية الهندية
+    **{chr(0x06F0 + d): str(d) for d in range(10)},  # الأرقام الفارسية
+})
+
+_TOKEN_RE = re.compile(r'\w+')
+
+NGRAM = 3
+
+# أوزان أنواع التطابق عند ترتيب النتائج
+EXACT_WEIGHT = 3.0
+PREFIX_WEIGHT = 2.0
+SUBSTRING_WEIGHT = 1.5
+FUZZY_THRESHOLD = 0.5
+
+
+def normalize_arabic(text):
+    """توحيد النص العربي للبحث (الهمزات، التاء المربوطة، التشكيل، التطويل...)"""
+    if not isinstance(text, str):
+        return ''
+    return text.translate(ARABIC_TRANSLATION).lower()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(normalize_arabic(text))
+
+
+def _ngrams(token):
+    padded = f" {token} "
+    return {padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)}
+
+
+class ProductSearchIndex:
+    """فهرس مقلوب (كلمة ← مواقع الصفوف) + فهرس n-grams على مفردات الأسماء
+
+    المواقع هي أرقام الصفوف (iloc) في الإطار الذي بُني منه الفهرس.
+    """
+
+    def __init__(self, names):
+        postings = {}
+        for position, name in enumerate(names):
+            for token in set(tokenize(name)):
+                postings.setdefault(token, []).append(position)
+
+        self.size = len(names)
+        self.vocabulary = sorted(postings)
+        self.postings = [np.asarray(postings[token], dtype=np.int32) for token in self.vocabulary]
+
+        grams = {}
+        for token_id, token in enumerate(self.vocabulary):
+            for gram in _ngrams(token):
+                grams.setdefault(gram, []).append(token_id)
+        self.grams = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in grams.items()}
+
+    def _prefix_matches(self, query_token):
+        """الكلمات التي تبدأ بـ query_token (بحث ثنائي في المفردات المرتبة)"""
+        start = bisect_left(self.vocabulary, query_token)
+        end = bisect_left(self.vocabulary, query_token + '\uffff')
+        return range(start, end)
+
+    def _match_token(self, query_token):
+        """{token_id: وزن التطابق} لكلمة واحدة من الاستعلام"""
+        matches = {}
+
+        for token_id in self._prefix_matches(query_token):
+            exact = self.vocabulary[token_id] == query_token
+            matches[token_id] = EXACT_WEIGHT if exact else PREFIX_WEIGHT
+
+        if len(query_token) < NGRAM:
+            return matches
+
+        # بحث جزئي: تقاطع قوائم n-grams الداخلية ثم التحقق من وجود النص فعلاً
+        inner = [query_token[i:i + NGRAM] for i in range(len(query_token) - NGRAM + 1)]
+        lists = [self.grams.get(gram) for gram in inner]
+        if all(ids is not None for ids in lists):
+            candidates = lists[0]
+            for ids in lists[1:]:
+                candidates = np.intersect1d(candidates, ids, assume_unique=True)
+            for token_id in candidates.tolist():
+                if token_id not in matches and query_token in self.vocabulary[token_id]:
+                    matches[token_id] = SUBSTRING_WEIGHT
+
+        if matches:
+            return matches
+
+        # بحث تقريبي (أخطاء إملائية): تشابه Dice على n-grams
+        query_grams = _ngrams(query_token)
+        lists = [self.grams[gram] for gram in query_grams if gram in self.grams]
+        if not lists:
+            return matches
+
+        token_ids, shared = np.unique(np.concatenate(lists), return_counts=True)
+        for token_id, count in zip(token_ids.tolist(), shared.tolist()):
+            token_grams = len(self.vocabulary[token_id]) + 2 - NGRAM + 1
+            similarity = 2 * count / (len(query_grams) + token_grams)
+            if similarity >= FUZZY_THRESHOLD:
+                matches[token_id] = similarity
+
+        return matches
+
+    def search(self, query):
+        """مواقع الصفوف المطابقة لكل كلمات الاستعلام، مرتبة حسب الصلة ثم حسب الترتيب الأصلي"""
+        query_tokens = tokenize(query)
+        if not query_tokens or self.size == 0:
+            return np.empty(0, dtype=np.int32)
+
+        total = np.zeros(self.size, dtype=np.float32)
+        required = np.ones(self.size, dtype=bool)
+
+        for query_token in dict.fromkeys(query_tokens):
+            matches = self._match_token(query_token)
+            if not matches:
+                return np.empty(0, dtype=np.int32)
+
+            # أفضل تطابق لهذه الكلمة في كل صف
+            lists = [self.postings[token_id] for token_id in matches]
+            rows = np.concatenate(lists)
+            weights = np.repeat(
+                np.fromiter(matches.values(), dtype=np.float32, count=len(matches)),
+                [len(ids) for ids in lists]
+            )
+            best = np.zeros(self.size, dtype=np.float32)
+            np.maximum.at(best, rows, weights)
+
+            total += best
+            required &= best > 0
+
+        positions = np.flatnonzero(required)
+        # ترتيب مستقر: الأعلى صلة أولاً، والتعادل يحافظ على الترتيب الأصلي (الأحدث تحديثاً)
+        order = np.argsort(-total[positions], kind='stable')
+        return positions[order].astype(np.int32)
@@ -0,0 +1,176 @@
+"""
+utils/snapshot.py - Shared Products Snapshot
+نسخة المنتجات كملف Arrow IPC مشترك بين عمليات Streamlit على نفس الجهاز (memory-mapped)
+
+المشترك فعلاً هو الأعمدة النصية فقط (تبقى مصفوفات Arrow فوق الملف، وهي معظم حجمه).
+الأعمدة الرقمية والمنطقية والتواريخ وفهارس category تُنسخ إلى ذاكرة كل عملية عند
+to_pandas: الملف مكتوب على دفعات فيحتاج كل عمود إلى مصفوفة numpy متصلة، والقيم المنطقية
+في Arrow مضغوطة كبتات.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+from .perf import perf
+
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow اختياري: بدونه تحتفظ كل عملية بنسختها الخاصة
+    pa = None
+
+SNAPSHOT_DIR = os.getenv('PRODUCTS_SNAPSHOT_DIR', 'data/snapshots')
+SNAPSHOT_ENABLED = os.getenv('PRODUCTS_SNAPSHOT', '1') == '1'
+
+# يُسجل في manifest؛ تغييره يجعل الملفات المكتوبة بصيغة أخرى تُتجاهل
+SNAPSHOT_FORMAT = 'arrow-stream'
+
+
+def snapshots_available():
+    return SNAPSHOT_ENABLED and pa is not None
+
+
+def _types_mapper(arrow_type):
+    """الأعمدة النصية تبقى مصفوفات Arrow فوق الملف المشترك بدلاً من نسخها إلى كائنات Python"""
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+    return None
+
+
+def _stable_field(field):
+    # أعمدة category: عدد القيم في الدفعة الأولى يحدد حجم الفهرس (int8)، وإذا كانت كلها NULL
+    # يُستنتج القاموس كنوع null؛ نثبت نوعاً يتسع لأي دفعة لاحقة
+    if pa.types.is_dictionary(field.type):
+        return field.with_type(pa.dictionary(pa.int32(), pa.string()))
+    # أعمدة نصية كل قيمها NULL في الدفعة الأولى تُستنتج كنوع null
+    if pa.types.is_null(field.type):
+        return field.with_type(pa.string())
+    return field
+
+
+def _stable_schema(schema):
+    """schema الدفعة الأولى بأنواع لا تعتمد على قيمها، لتُكتب بها بقية الدفعات"""
+    return pa.schema([_stable_field(field) for field in schema], metadata=schema.metadata)
+
+
+class ProductSnapshot:
+    """ملف النسخة + ملف manifest صغير يحدد الملف الحالي ونسخته"""
+
+    def __init__(self, directory, key):
+        self.directory = directory
+        self.key = key
+        self.manifest_path = os.path.join(directory, f"{key}.json")
+        self.lock_path = os.path.join(directory, f"{key}.lock")
+
+        os.makedirs(directory, exist_ok=True)
+
+        # آخر ملف تم ربطه بالذاكرة في هذه العملية
+        self._mapped_file = None
+        self._mapped_frame = None
+
+    def manifest(self):
+        """محتوى manifest الحالي أو None"""
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        # ملف بصيغة أقدم: نعامله كأنه غير موجود فيُعاد إنشاؤه
+        return manifest if manifest.get('format') == SNAPSHOT_FORMAT else None
+
+    def write(self, frame, version, full_refreshed_at):
+        """كتابة الإطار كملف جديد ثم تبديل manifest إليه"""
+        name, rows = self.write_file([frame])
+        return self.publish(name, rows, version, full_refreshed_at)
+
+    def write_file(self, batches):
+        """كتابة دفعات DataFrame إلى ملف نسخة جديد دفعة بدفعة (لا تُجمع في الذاكرة)
+
+        صيغة IPC stream وليس file: أعمدة category لها قاموس مختلف في كل دفعة،
+        وصيغة file لا تسمح بتغيير القاموس بين الدفعات.
+        """
+        name = f"{self.key}-{time.time_ns()}-{os.getpid()}.arrow"
+        path = os.path.join(self.directory, name)
+        rows = 0
+
+        with perf.timed('snapshot.write') as span:
+            try:
+                with pa.OSFile(f"{path}.tmp", 'wb') as sink:
+                    writer = None
+                    for batch in batches:
+                        if writer is None:
+                            schema = _stable_schema(pa.Schema.from_pandas(batch, preserve_index=False))
+                            # بدون ضغط حتى يمكن قراءته مباشرة من الذاكرة المربوطة (zero-copy)
+                            writer = pa.ipc.new_stream(sink, schema)
+                        writer.write_table(pa.Table.from_pandas(batch, schema=schema, preserve_index=False))
+                        rows += len(batch)
+                    if writer is not None:
+                        writer.close()
+            except BaseException:
+                if os.path.exists(f"{path}.tmp"):
+                    os.remove(f"{path}.tmp")
+                raise
+            os.replace(f"{path}.tmp", path)
+            span.rows = rows
+            span.bytes = os.path.getsize(path)
+
+        return name, rows
+
+    def publish(self, name, rows, version, full_refreshed_at):
+        """تبديل manifest إلى ملف مكتوب بشكل ذري وحذف الملفات القديمة"""
+        manifest = {
+            'format': SNAPSHOT_FORMAT,
+            'file': name,
+            'version': version,
+            'rows': rows,
+            'written_at': time.time(),
+            'full_refreshed_at': full_refreshed_at,
+        }
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+        self._cleanup(keep=name)
+        return manifest
+
+    def read(self, manifest):
+        """الإطار من ملف النسخة عبر memory map (نفس الإطار إذا لم يتغير الملف)"""
+        return self.map_file(manifest['file'])
+
+    def map_file(self, name):
+        if name == self._mapped_file:
+            return self._mapped_frame
+
+        with perf.timed('snapshot.map') as span:
+            source = pa.memory_map(os.path.join(self.directory, name), 'r')
+            table = pa.ipc.open_stream(source).read_all()
+            frame = table.to_pandas(types_mapper=_types_mapper)
+            span.rows = len(frame)
+
+        self._mapped_file = name
+        self._mapped_frame = frame
+        return frame
+
+    def _cleanup(self, keep):
+        """حذف الملفات القديمة (العمليات التي ما زالت تربطها بالذاكرة تحتفظ بها حتى تنتهي)"""
+        for path in glob.glob(os.path.join(self.directory, f"{self.key}-*.arrow")):
+            if os.path.basename(path) == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                # Windows لا يسمح بحذف ملف مربوط بالذاكرة؛ يُحذف في مرة قادمة
+                pass
+
+
+def snapshot_for(dsn):
+    """نسخة مشتركة خاصة بقاعدة البيانات، أو None إذا كانت الميزة غير متاحة"""
+    if not snapshots_available():
+        return None
+    key = 'products-' + hashlib.sha256((dsn or '').encode()).hexdigest()[:12]
+    return ProductSnapshot(SNAPSHOT_DIR, key)
@@ -0,0 +1,69 @@
+"""
+utils/static_assets.py - Static Assets
+تحميل الشعار وتصغيره مرة واحدة لكل عملية، وتقديمه برابط ثابت قابل للتخزين في المتصفح
+"""
+
+import base64
+import hashlib
+import io
+import os
+from functools import lru_cache
+
+import streamlit as st
+from PIL import Image
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static")
+LOGO_PATH = os.path.join(STATIC_DIR, "logo.png")
+
+# الملفات المحسّنة تُكتب هنا وتُقدم عبر static serving في Streamlit
+CACHE_DIR = os.path.join(STATIC_DIR, "cache")
+
+
+@lru_cache(maxsize=None)
+def optimized_image(path, size):
+    """الصورة مصغرة إلى size بكسل كـ PNG محسّن، أو None إذا تعذر تحميلها"""
+    try:
+        with Image.open(path) as image:
+            image.thumbnail((size, size))
+            output = io.BytesIO()
+            image.save(output, 'PNG', optimize=True)
+            return output.getvalue()
+    except OSError:
+        return None
+
+
+@lru_cache(maxsize=None)
+def _asset_url(path, size):
+    data = optimized_image(path, size)
+    if data is None:
+        return None
+
+    if st.get_option('server.enableStaticServing'):
+        # اسم الملف يتضمن بصمة المحتوى، فيمكن للمتصفح تخزينه دون خوف من نسخة قديمة
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        stem = os.path.splitext(os.path.basename(path))[0]
+        filename = f"{stem}-{size}-{digest}.png"
+        cached_path = os.path.join(CACHE_DIR, filename)
+
+        try:
+            if not os.path.exists(cached_path):
+                os.makedirs(CACHE_DIR, exist_ok=True)
+                tmp_path = f"{cached_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, cached_path)
+            return f"app/static/cache/{filename}"
+        except OSError:
+            pass
+
+    return f"data:image/png;base64,{base64.b64encode(data).decode()}"
+
+
+def asset_url(path, size):
+    """رابط الصورة المصغرة: ملف ثابت مُبصّم إن أمكن، وإلا data URI (محسوب مرة واحدة)"""
+    return _asset_url(os.path.abspath(path), size)
+
+
+def logo_url(display_size=100):
+    """رابط الشعار بضعف مقاس العرض (للشاشات عالية الدقة)"""
+    return asset_url(LOGO_PATH, display_size * 2)
@@ -0,0 +1,444 @@
+"""
+utils/user_backends.py - User Storage Backends
+طبقة تخزين المستخدمين: JSON (افتراضي) أو SQLite أو Postgres
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from .file_lock import file_lock
+from .perf import perf
+
+
+class UserStore:
+    """نسخة المستخدمين في الذاكرة مع فهرس بالأسماء الصغيرة (case-insensitive)"""
+
+    def __init__(self, users_file, check_interval=2.0):
+        self.users_file = users_file
+        # أقل مدة بين فحصين لتغيّر الملف من عملية أخرى (stat فقط، بدون قراءة)
+        self.check_interval = check_interval
+
+        self.users = {}
+        self.index = {}
+        self.signature = None
+        self.generation = 0
+        self.checked_at = 0.0
+        self._lock = threading.RLock()
+
+        # الكتابة المجمعة: التعديلات المنتظرة تُطبق كلها في كتابة واحدة
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.users_file)
+            return (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _set(self, users, signature):
+        self.users = users
+        self.index = {username.lower(): username for username in users}
+        self.signature = signature
+        self.generation += 1
+
+    def _read_file(self):
+        """قراءة الملف؛ الملف التالف يرفع خطأ بدلاً من اعتباره فارغاً"""
+        with perf.timed('users.read_file') as span:
+            try:
+                with open(self.users_file, 'r', encoding='utf-8') as f:
+                    users = json.load(f)
+                    span.bytes = f.tell()
+                    span.rows = len(users)
+                    return users
+            except FileNotFoundError:
+                return {}
+
+    def _reload(self):
+        signature = self._file_signature()
+        try:
+            users = self._read_file()
+        except ValueError:
+            # نحتفظ بآخر نسخة سليمة في الذاكرة
+            return
+        self._set(users, signature)
+
+    def _write_file(self, users):
+        """كتابة ذرية: ملف مؤقت ثم os.replace"""
+        directory = os.path.dirname(os.path.abspath(self.users_file))
+        tmp_path = f"{self.users_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+        try:
+            with perf.timed('users.write_file', rows=len(users)) as span, \
+                    open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(users, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+                span.bytes = f.tell()
+            os.replace(tmp_path, self.users_file)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        if hasattr(os, 'O_DIRECTORY'):
+            dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def mutate(self, func):
+        """تطبيق func(users) على أحدث نسخة من الملف وحفظها، وإرجاع نتيجة func
+
+        التعديلات المتزامنة من عدة خيوط تُجمع في كتابة واحدة، والقفل على الملف
+        يمنع ضياع التحديثات بين العمليات. يجب ألا تعدّل func شيئاً قبل التحقق من صلاحية العملية.
+        """
+        entry = {'func': func, 'done': False, 'result': None, 'error': None}
+        with self._pending_lock:
+            self._pending.append(entry)
+
+        with self._write_lock:
+            # ربما طبّق الخيط السابق تعديلنا ضمن دفعته
+            if not entry['done']:
+                with self._pending_lock:
+                    batch, self._pending = self._pending, []
+                self._commit(batch)
+
+        if entry['error'] is not None:
+            raise entry['error']
+        return entry['result']
+
+    def _commit(self, batch):
+        try:
+            with file_lock(f"{self.users_file}.lock"):
+                users = self._read_file()
+
+                for entry in batch:
+                    try:
+                        entry['result'] = entry['func'](users)
+                    except Exception as e:
+                        entry['error'] = e
+
+                self._write_file(users)
+
+            with self._lock:
+                self._set(users, self._file_signature())
+                self.checked_at = time.monotonic()
+
+        except Exception as e:
+            for entry in batch:
+                if entry['error'] is None:
+                    entry['error'] = e
+        finally:
+            for entry in batch:
+                entry['done'] = True
+
+    def current(self):
+        """المستخدمون الحاليون (لا يُقرأ الملف إلا إذا تغيّر)"""
+        if time.monotonic() - self.checked_at < self.check_interval:
+            return self.users
+
+        with self._lock:
+            if self._file_signature() != self.signature:
+                self._reload()
+            self.checked_at = time.monotonic()
+            return self.users
+
+    def find(self, username):
+        """البحث عن اسم المستخدم المخزن بدون حساسية لحالة الأحرف"""
+        self.current()
+        return self.index.get(username.lower())
+
+
+# نسخة واحدة لكل ملف مستخدمين على مستوى العملية
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_user_store(users_file):
+    """الحصول على مخزن المستخدمين المشترك الخاص بالملف"""
+    path = os.path.abspath(users_file)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = UserStore(
+                users_file, check_interval=float(os.getenv('USERS_RELOAD_INTERVAL', '2'))
+            )
+        return _stores[path]
+
+
+class UserBackend:
+    """واجهة تخزين المستخدمين التي يعتمد عليها UserManager"""
+
+    def find(self, username):
+        """(اسم المستخدم المخزن، بياناته) بدون حساسية لحالة الأحرف، أو None"""
+        raise NotImplementedError
+
+    def get(self, username):
+        """بيانات المستخدم بالاسم المطابق تماماً، أو None"""
+        raise NotImplementedError
+
+    def list_users(self):
+        """كل المستخدمين كقاموس {username: data}"""
+        raise NotImplementedError
+
+    def insert(self, username, data):
+        """إضافة مستخدم؛ False إذا كان الاسم موجوداً (case-insensitive)"""
+        raise NotImplementedError
+
+    def modify(self, username, func):
+        """func(data) تعدل البيانات في مكانها وترجع نتيجة؛ data = None إذا لم يوجد المستخدم"""
+        raise NotImplementedError
+
+    def delete(self, username):
+        """حذف المستخدم وإرجاع بياناته السابقة، أو None"""
+        raise NotImplementedError
+
+    def is_empty(self):
+        raise NotImplementedError
+
+
+class JSONUserBackend(UserBackend):
+    """ملف JSON واحد مع فهرس في الذاكرة (الخيار الافتراضي)"""
+
+    def __init__(self, users_file='data/users.json'):
+        self.users_file = users_file
+        os.makedirs(os.path.dirname(users_file) or '.', exist_ok=True)
+        self.store = get_user_store(users_file)
+
+    def find(self, username):
+        users = self.store.current()
+        stored_username = self.store.find(username)
+        if stored_username is None or stored_username not in users:
+            return None
+        return stored_username, users[stored_username]
+
+    def get(self, username):
+        return self.store.current().get(username)
+
+    def list_users(self):
+        return self.store.current()
+
+    def insert(self, username, data):
+        # فحص سريع من الفهرس قبل أخذ القفل
+        if self.store.find(username) is not None:
+            return False
+
+        def apply(users):
+            username_lower = username.lower()
+            if any(existing.lower() == username_lower for existing in users):
+                return False
+            users[username] = data
+            return True
+
+        return self.store.mutate(apply)
+
+    def modify(self, username, func):
+        return self.store.mutate(lambda users: func(users.get(username)))
+
+    def delete(self, username):
+        return self.store.mutate(lambda users: users.pop(username, None))
+
+    def is_empty(self):
+        return not os.path.exists(self.users_file) or not self.store.current()
+
+
+class SQLiteUserBackend(UserBackend):
+    """SQLite بوضع WAL مع فهرس فريد على الاسم بالأحرف الصغيرة"""
+
+    def __init__(self, db_path='data/users.db'):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self._local = threading.local()
+
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS users (
+                    username TEXT PRIMARY KEY,
+                    username_lower TEXT NOT NULL UNIQUE,
+                    data TEXT NOT NULL
+                )
+            """)
+
+    def _conn(self):
+        """اتصال لكل خيط (وكل عملية: الطبقة مشتركة، واتصال SQLite لا يُستخدم بعد fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        # IMMEDIATE يأخذ قفل الكتابة من البداية فلا تتداخل عمليتا read-modify-write
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def find(self, username):
+        row = self._conn().execute(
+            "SELECT username, data FROM users WHERE username_lower = ?", (username.lower(),)
+        ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def get(self, username):
+        row = self._conn().execute(
+            "SELECT data FROM users WHERE username = ?", (username,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list_users(self):
+        rows = self._conn().execute("SELECT username, data FROM users ORDER BY rowid").fetchall()
+        return {username: json.loads(data) for username, data in rows}
+
+    def insert(self, username, data):
+        try:
+            with self._transaction() as conn:
+                conn.execute(
+                    "INSERT INTO users (username, username_lower, data) VALUES (?, ?, ?)",
+                    (username, username.lower(), json.dumps(data, ensure_ascii=False))
+                )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def modify(self, username, func):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT data FROM users WHERE username = ?", (username,)).fetchone()
+            data = json.loads(row[0]) if row else None
+            result = func(data)
+            if data is not None:
+                conn.execute(
+                    "UPDATE users SET data = ? WHERE username = ?",
+                    (json.dumps(data, ensure_ascii=False), username)
+                )
+            return result
+
+    def delete(self, username):
+        with self._transaction() as conn:
+            row = conn.execute("SELECT data FROM users WHERE username = ?", (username,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("DELETE FROM users WHERE username = ?", (username,))
+            return json.loads(row[0])
+
+    def is_empty(self):
+        return self._conn().execute("SELECT 1 FROM users LIMIT 1").fetchone() is None
+
+
+class PostgresUserBackend(UserBackend):
+    """جدول app_users في نفس قاعدة بيانات المنتجات (مشترك بين كل نسخ التطبيق)"""
+
+    def __init__(self, db=None):
+        from .database import Database
+
+        self.pool = (db or Database()).pool
+
+        def create_table(conn):
+            with conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS app_users (
+                        username TEXT PRIMARY KEY,
+                        username_lower TEXT NOT NULL UNIQUE,
+                        data JSONB NOT NULL
+                    )
+                """)
+        self.pool.run(create_table)
+
+    def _fetchone(self, query, params):
+        def run(conn):
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                return cur.fetchone()
+        return self.pool.run(run)
+
+    def find(self, username):
+        row = self._fetchone(
+            "SELECT username, data FROM app_users WHERE username_lower = %s", (username.lower(),)
+        )
+        return (row[0], row[1]) if row else None
+
+    def get(self, username):
+        row = self._fetchone("SELECT data FROM app_users WHERE username = %s", (username,))
+        return row[0] if row else None
+
+    def list_users(self):
+        def run(conn):
+            with conn.cursor() as cur:
+                cur.execute("SELECT username, data FROM app_users ORDER BY data->>'created_at'")
+                return {username: data for username, data in cur.fetchall()}
+        return self.pool.run(run)
+
+    def insert(self, username, data):
+        from psycopg2.extras import Json
+
+        row = self._fetchone("""
+            INSERT INTO app_users (username, username_lower, data) VALUES (%s, %s, %s)
+            ON CONFLICT DO NOTHING
+            RETURNING username
+        """, (username, username.lower(), Json(data)))
+        return row is not None
+
+    def modify(self, username, func):
+        from psycopg2.extras import Json
+
+        # لا نعيد المحاولة تلقائياً لأن func قد تكون لها آثار جانبية
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT data FROM app_users WHERE username = %s FOR UPDATE", (username,))
+                row = cur.fetchone()
+                data = row[0] if row else None
+                result = func(data)
+                if data is not None:
+                    cur.execute("UPDATE app_users SET data = %s WHERE username = %s", (Json(data), username))
+                return result
+
+    def delete(self, username):
+        row = self._fetchone("DELETE FROM app_users WHERE username = %s RETURNING data", (username,))
+        return row[0] if row else None
+
+    def is_empty(self):
+        return self._fetchone("SELECT 1 FROM app_users LIMIT 1", None) is None
+
+
+# طبقة واحدة لكل (نوع، ملف أو قاعدة بيانات) على مستوى العملية: إنشاء الجداول مرة واحدة
+# وليس مع كل UserManager (أي مع كل إعادة تشغيل للصفحة)
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_user_backend(users_file='data/users.json'):
+    """طبقة التخزين المشتركة حسب USER_STORE_BACKEND (json / sqlite / postgres)"""
+    kind = os.getenv('USER_STORE_BACKEND', 'json').lower()
+
+    if kind == 'sqlite':
+        location = os.path.abspath(os.getenv('USER_STORE_PATH', 'data/users.db'))
+    elif kind == 'postgres':
+        location = os.getenv('SUPABASE_URL')
+    else:
+        kind, location = 'json', os.path.abspath(users_file)
+
+    with _backends_lock:
+        if (kind, location) not in _backends:
+            _backends[kind, location] = _create_backend(kind, location)
+        return _backends[kind, location]
+
+
+def _create_backend(kind, location):
+    if kind == 'sqlite':
+        return SQLiteUserBackend(location)
+    if kind == 'postgres':
+        return PostgresUserBackend()
+    return JSONUserBackend(location)
@@ -2,25 +2,76 @@
 utils/user_management.py - User Management System
 """
 
-import json
 import os
-import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime
 import streamlit as st
-from PIL import Image
+from PIL import Image, features
 import io
 
+from .credentials import hash_password, needs_rehash, verified_cache, verify_user_password
+from .perf import perf
+from .user_backends import get_user_backend
+
+# المقاسات الجاهزة لصورة البروفايل (بالبكسل)
+AVATAR_SIZES = {
+    'sidebar': 120,
+    'profile': 240
+}
+
+AVATAR_FORMAT = ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+
+class AvatarCache:
+    """LRU في الذاكرة لصور البروفايل الجاهزة، محدود بإجمالي الحجم"""
+
+    def __init__(self, max_bytes=8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def discard(self, filename):
+        """حذف كل المقاسات الخاصة بصورة معينة"""
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == filename]:
+                self.size -= len(self._entries.pop(key))
+
+
+avatar_cache = AvatarCache(max_bytes=int(os.getenv('AVATAR_CACHE_MB', '8')) * 1024 * 1024)
+
+
 class UserManager:
-    def __init__(self, users_file='data/users.json'):
+    def __init__(self, users_file='data/users.json', backend=None):
         self.users_file = users_file
         self.avatars_dir = 'data/avatars'
+        # طبقة التخزين (JSON افتراضياً، أو SQLite/Postgres حسب USER_STORE_BACKEND)
+        self.backend = backend or get_user_backend(users_file)
 
         # إنشاء المجلدات إذا لم تكن موجودة
-        os.makedirs(os.path.dirname(users_file), exist_ok=True)
         os.makedirs(self.avatars_dir, exist_ok=True)
 
-        # تهيئة ملف المستخدمين
-        if not os.path.exists(users_file):
+        # تهيئة المستخدمين الافتراضيين
+        if self.backend.is_empty():
             self._create_default_users()
 
     def _create_default_users(self):
@@ -43,56 +94,53 @@ class UserManager:
                 "avatar": None
             }
         }
-        self._save_users(default_users)
+
+        # insert يتجاهل المستخدم إذا أنشأته عملية أخرى في نفس اللحظة
+        for username, data in default_users.items():
+            self.backend.insert(username, data)
 
     def _hash_password(self, password):
         """تشفير كلمة المرور"""
-        return hashlib.sha256(password.encode()).hexdigest()
+        return hash_password(password)
 
-    def _load_users(self):
-        """تحميل المستخدمين من الملف"""
-        try:
-            with open(self.users_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {}
+    def _upgrade_password_hash(self, username, password, old_hash):
+        """ترقية الهاش القديم/الأضعف بعد تسجيل دخول ناجح"""
+        new_hash = self._hash_password(password)
+
+        def apply(user):
+            # لا نستبدل كلمة مرور تغيرت في نفس اللحظة
+            if user is not None and user['password'] == old_hash:
+                user['password'] = new_hash
 
-    def _save_users(self, users):
-        """حفظ المستخدمين في الملف"""
-        with open(self.users_file, 'w', encoding='utf-8') as f:
-            json.dump(users, f, ensure_ascii=False, indent=2)
+        self.backend.modify(username, apply)
+        verified_cache.add(username, password, new_hash)
 
+    @perf.instrument('users.authenticate')
     def authenticate(self, username, password):
         """التحقق من بيانات الدخول"""
-        users = self._load_users()
-
         # البحث case-insensitive
-        username_lower = username.lower()
-
-        for stored_username, user_data in users.items():
-            if stored_username.lower() == username_lower:
-                if user_data['password'] == self._hash_password(password):
-                    return {
-                        'username': stored_username,
-                        'name': user_data['name'],
-                        'role': user_data['role'],
-                        'email': user_data.get('email', ''),
-                        'avatar': user_data.get('avatar')
-                    }
+        found = self.backend.find(username)
+        if found is None:
+            return None
+
+        stored_username, user_data = found
+        if verify_user_password(stored_username, password, user_data['password']):
+            if needs_rehash(user_data['password']):
+                self._upgrade_password_hash(stored_username, password, user_data['password'])
+
+            return {
+                'username': stored_username,
+                'name': user_data['name'],
+                'role': user_data['role'],
+                'email': user_data.get('email', ''),
+                'avatar': user_data.get('avatar')
+            }
 
         return None
 
     def add_user(self, username, password, name, role, email=''):
         """إضافة مستخدم جديد"""
-        users = self._load_users()
-
-        # التحقق من عدم وجود username مماثل (case-insensitive)
-        username_lower = username.lower()
-        for existing_username in users.keys():
-            if existing_username.lower() == username_lower:
-                return False, "اسم المستخدم موجود بالفعل"
-
-        users[username] = {
+        new_user = {
             "password": self._hash_password(password),
             "name": name,
             "role": role,
@@ -101,56 +149,62 @@ class UserManager:
             "avatar": None
         }
 
-        self._save_users(users)
+        # التحقق من عدم وجود username مماثل (case-insensitive) يتم داخل طبقة التخزين
+        if not self.backend.insert(username, new_user):
+            return False, "اسم المستخدم موجود بالفعل"
+
         return True, "تم إضافة المستخدم بنجاح"
 
     def update_user(self, username, current_user_role='super_admin', **kwargs):
         """تحديث بيانات المستخدم"""
-        users = self._load_users()
+        if kwargs.get('password'):
+            kwargs['password'] = self._hash_password(kwargs['password'])
 
-        if username not in users:
-            return False, "المستخدم غير موجود"
+        def apply(user):
+            if user is None:
+                return False, "المستخدم غير موجود"
 
-        # منع تعديل Super Admin من Super Admin آخر
-        if users[username]['role'] == 'super_admin' and current_user_role == 'super_admin':
-            # السماح فقط بتعديل بياناته الشخصية
-            allowed_fields = ['name', 'email', 'password', 'avatar']
-            for key in list(kwargs.keys()):
-                if key not in allowed_fields:
-                    return False, "لا يمكن تعديل صلاحيات مدير أساسي آخر"
+            # منع تعديل Super Admin من Super Admin آخر
+            if user['role'] == 'super_admin' and current_user_role == 'super_admin':
+                # السماح فقط بتعديل بياناته الشخصية
+                allowed_fields = ['name', 'email', 'password', 'avatar']
+                for key in list(kwargs.keys()):
+                    if key not in allowed_fields:
+                        return False, "لا يمكن تعديل صلاحيات مدير أساسي آخر"
 
-        for key, value in kwargs.items():
-            if key == 'password' and value:
-                users[username]['password'] = self._hash_password(value)
-            elif key != 'password':
-                users[username][key] = value
+            for key, value in kwargs.items():
+                if key == 'password' and value:
+                    user['password'] = value
+                elif key != 'password':
+                    user[key] = value
 
-        self._save_users(users)
-        return True, "تم تحديث البيانات بنجاح"
+            return True, "تم تحديث البيانات بنجاح"
+
+        return self.backend.modify(username, apply)
 
     def delete_user(self, username):
         """حذف مستخدم"""
-        users = self._load_users()
+        user = self.backend.get(username)
 
-        if username not in users:
+        if user is None:
             return False, "المستخدم غير موجود"
 
-        if users[username]['role'] == 'super_admin':
+        if user['role'] == 'super_admin':
             return False, "لا يمكن حذف المدير الأساسي"
 
-        # حذف صورة البروفايل إذا كانت موجودة
-        if users[username].get('avatar'):
-            avatar_path = os.path.join(self.avatars_dir, users[username]['avatar'])
-            if os.path.exists(avatar_path):
-                os.remove(avatar_path)
+        user = self.backend.delete(username)
+        if user is None:
+            return False, "المستخدم غير موجود"
+
+        # حذف صورة البروفايل إذا كانت موجودة (بعد حذف المستخدم)
+        if user.get('avatar'):
+            self._remove_avatar_files(user['avatar'])
 
-        del users[username]
-        self._save_users(users)
         return True, "تم حذف المستخدم بنجاح"
 
     def get_all_users(self):
         """جلب جميع المستخدمين"""
-        users = self._load_users()
+        users = self.backend.list_users()
         users_list = []
 
         for username, data in users.items():
@@ -167,9 +221,7 @@ class UserManager:
 
     def upload_avatar(self, username, uploaded_file):
         """رفع صورة البروفايل"""
-        users = self._load_users()
-
-        if username not in users:
+        if self.backend.get(username) is None:
             return False, "المستخدم غير موجود"
 
         try:
@@ -184,46 +236,120 @@ class UserManager:
             image.thumbnail((300, 300))
 
             # حفظ الصورة
-            filename = f"{username}_{datetime.now().strftime('%Y%m%d%H%M%S')}.jpg"
+            filename = f"{username}_{datetime.now().strftime('%Y%m%d%H%M%S%f')}.jpg"
             filepath = os.path.join(self.avatars_dir, filename)
             image.save(filepath, 'JPEG', quality=85)
 
-            # حذف الصورة القديمة
-            old_avatar = users[username].get('avatar')
-            if old_avatar:
-                old_path = os.path.join(self.avatars_dir, old_avatar)
-                if os.path.exists(old_path):
-                    os.remove(old_path)
+            # تجهيز المقاسات الثابتة مرة واحدة عند الرفع
+            for size in AVATAR_SIZES:
+                avatar_cache.put((username, filename, size), self._build_variant(image, filename, size))
 
             # تحديث بيانات المستخدم
-            users[username]['avatar'] = filename
-            self._save_users(users)
+            def apply(user):
+                if user is None:
+                    return False, None
+                old_avatar = user.get('avatar')
+                user['avatar'] = filename
+                return True, old_avatar
+
+            found, old_avatar = self.backend.modify(username, apply)
+            if not found:
+                self._remove_avatar_files(filename)
+                return False, "المستخدم غير موجود"
+
+            # حذف الصورة القديمة
+            if old_avatar and old_avatar != filename:
+                self._remove_avatar_files(old_avatar)
 
             return True, "تم رفع الصورة بنجاح"
 
         except Exception as e:
             return False, f"خطأ في رفع الصورة: {str(e)}"
 
+    def _variant_path(self, filename, size):
+        stem = os.path.splitext(filename)[0]
+        return os.path.join(self.avatars_dir, f"{stem}_{size}.{AVATAR_FORMAT[1]}")
+
+    def _build_variant(self, image, filename, size):
+        """تصغير الصورة إلى أحد المقاسات الثابتة وحفظها وإرجاع bytes"""
+        variant = image.copy()
+        variant.thumbnail((AVATAR_SIZES[size], AVATAR_SIZES[size]))
+
+        output = io.BytesIO()
+        variant.save(output, AVATAR_FORMAT[0], quality=80, optimize=True)
+        data = output.getvalue()
+
+        with open(self._variant_path(filename, size), 'wb') as f:
+            f.write(data)
+        return data
+
+    def _remove_avatar_files(self, filename):
+        """حذف الصورة الأصلية وكل مقاساتها"""
+        avatar_cache.discard(filename)
+        paths = [os.path.join(self.avatars_dir, filename)]
+        paths += [self._variant_path(filename, size) for size in AVATAR_SIZES]
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def get_avatar_bytes(self, username, size='sidebar'):
+        """صورة البروفايل بالمقاس المطلوب (من الذاكرة بعد أول طلب)"""
+        user = self.backend.get(username)
+        if not user or not user.get('avatar'):
+            return None
+
+        filename = user['avatar']
+        key = (username, filename, size)
+        data = avatar_cache.get(key)
+        if data is not None:
+            return data
+
+        variant_path = self._variant_path(filename, size)
+        try:
+            if os.path.exists(variant_path):
+                with open(variant_path, 'rb') as f:
+                    data = f.read()
+            else:
+                # صور رُفعت قبل وجود المقاسات الجاهزة
+                with Image.open(os.path.join(self.avatars_dir, filename)) as image:
+                    data = self._build_variant(image.convert('RGB'), filename, size)
+        except OSError:
+            return None
+
+        avatar_cache.put(key, data)
+        return data
+
     def get_avatar_path(self, username):
         """الحصول على مسار صورة البروفايل"""
-        users = self._load_users()
+        user = self.backend.get(username)
 
-        if username in users and users[username].get('avatar'):
-            return os.path.join(self.avatars_dir, users[username]['avatar'])
+        if user and user.get('avatar'):
+            return os.path.join(self.avatars_dir, user['avatar'])
 
         return None
 
     def change_password(self, username, old_password, new_password):
         """تغيير كلمة المرور"""
-        users = self._load_users()
+        user = self.backend.get(username)
 
-        if username not in users:
+        if user is None:
             return False, "المستخدم غير موجود"
 
-        if users[username]['password'] != self._hash_password(old_password):
+        # التحقق البطيء يتم خارج القفل، ثم نتأكد أن الهاش لم يتغير في الأثناء
+        old_hash = user['password']
+        if not verify_user_password(username, old_password, old_hash):
             return False, "كلمة المرور القديمة غير صحيحة"
 
-        users[username]['password'] = self._hash_password(new_password)
-        self._save_users(users)
+        new_hash = self._hash_password(new_password)
+
+        def apply(user):
+            if user is None:
+                return False, "المستخدم غير موجود"
+
+            if user['password'] != old_hash:
+                return False, "كلمة المرور القديمة غير صحيحة"
+
+            user['password'] = new_hash
+            return True, "تم تغيير كلمة المرور بنجاح"
 
-        return True, "تم تغيير كلمة المرور بنجاح"
+        return self.backend.modify(username, apply)